@@ -0,0 +1,99 @@
+"""
+Allocations and garbage collection cost of the per-Tee physics path.
+
+    python -m benchmarks.alloc --tees 8 --ticks 10000
+
+Every tee runs, jumps and hooks back and forth on an open field. The run
+is timed with the cyclic GC's own time measured through gc.callbacks, then
+repeated with Vector2.__init__ wrapped to count every vector allocated.
+"""
+import argparse
+import gc
+import time
+
+from benchmarks.maps import open_field, save_temp
+from engine.engine import DDNetPhysicsEngine
+from engine.maploader import MapLoader
+from engine.tee import Tee
+from shared import Vector2
+
+def simulate(map: MapLoader, tees: int, ticks: int):
+    players = []
+    for i in range(tees):
+        tee = Tee()
+        spawn = map.spawners[(i * 7) % len(map.spawners)]
+        tee.position = spawn.position * 32 + Vector2(16, 16)
+        players.append(tee)
+    engine = DDNetPhysicsEngine(map, players)
+
+    for tick in range(ticks):
+        for i, tee in enumerate(players):
+            phase = (tick + i * 13) % 100
+            tee.direction = 1 if phase < 50 else -1
+            tee.should_jump = phase % 25 == 0
+            tee.should_hook = 20 <= phase < 70
+            tee.target.x = 200 * tee.direction
+            tee.target.y = -300
+        engine.tick(1/50)
+
+def count_vectors(map: MapLoader, tees: int, ticks: int) -> int:
+    count = 0
+    init = Vector2.__init__
+    def counting_init(self, x, y):
+        nonlocal count
+        count += 1
+        init(self, x, y)
+
+    Vector2.__init__ = counting_init
+    try:
+        simulate(map, tees, ticks)
+    finally:
+        Vector2.__init__ = init
+    return count
+
+def run(tees: int, ticks: int) -> dict:
+    map = MapLoader(save_temp(open_field()), use_cache=False)
+
+    gc_time = 0.0
+    gc_runs = 0
+    started = 0.0
+    def on_gc(phase, info):
+        nonlocal gc_time, gc_runs, started
+        if phase == "start":
+            started = time.perf_counter()
+        else:
+            gc_time += time.perf_counter() - started
+            gc_runs += 1
+
+    gc.collect()
+    gc.callbacks.append(on_gc)
+    start = time.perf_counter()
+    try:
+        simulate(map, tees, ticks)
+    finally:
+        elapsed = time.perf_counter() - start
+        gc.callbacks.remove(on_gc)
+
+    vectors = count_vectors(map, tees, ticks)
+    return {
+        "tees": tees,
+        "ticks": ticks,
+        "seconds": elapsed,
+        "vectors_allocated": vectors,
+        "vectors_per_tee_tick": vectors / (tees * ticks),
+        "gc_runs": gc_runs,
+        "gc_seconds": gc_time,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tees", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=10000)
+    args = parser.parse_args()
+
+    result = run(args.tees, args.ticks)
+    for key, value in result.items():
+        print(f"{key:>20}: {value:.4f}" if isinstance(value, float) else f"{key:>20}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import numpy as np
+from twmap import Map
+
+from shared import GameTileType, TeleTileType
+
+def new_map(width: int, height: int) -> tuple[Map, np.ndarray]:
+    """
+    Empty map with a physics group and a Game layer. Returns the map and a
+    copy of its Game tiles, write them back with `map.game_layer().tiles = tiles`.
+    """
+    map = Map.empty("DDNet06")
+    group = map.groups.new_physics()
+    layer = group.layers.new_game(width, height)
+    return map, layer.tiles
+
+def open_field(width: int = 200, height: int = 100) -> Map:
+    # Walled box with a floor, spawns along the floor
+    map, tiles = new_map(width, height)
+    tiles[:, :, 0] = GameTileType.EMPTY
+    tiles[0, :, 0] = GameTileType.HOOKABLE
+    tiles[height - 1, :, 0] = GameTileType.UNHOOKABLE
+    tiles[:, 0, 0] = GameTileType.UNHOOKABLE
+    tiles[:, width - 1, 0] = GameTileType.UNHOOKABLE
+    tiles[height - 2, 2:width - 2, 0] = GameTileType.SPAWN
+    map.game_layer().tiles = tiles
+    return map
+
+def save_temp(map: Map, name: str = "synthetic") -> str:
+    # MapLoader reads from disk, the file goes away with the process' temp dir
+    directory = tempfile.mkdtemp(prefix="pyddnet-")
+    path = os.path.join(directory, f"{name}.map")
+    map.save(path)
+    return path
+
+def scattered(width: int = 200, height: int = 100, density: float = 0.05, seed: int = 0) -> Map:
+    # Open field with random single solid tiles to collide with
+    map = open_field(width, height)
+    tiles = map.game_layer().tiles
+    rng = np.random.default_rng(seed)
+    blocks = rng.random((height - 4, width - 4)) < density
+    kinds = np.where(rng.random(blocks.shape) < 0.5, GameTileType.HOOKABLE, GameTileType.UNHOOKABLE)
+    tiles[2:height - 2, 2:width - 2, 0][blocks] = kinds[blocks]
+    map.game_layer().tiles = tiles
+    return map
+
+def lattice(width: int = 200, height: int = 100, spacing: int = 4) -> Map:
+    # Hookable tiles every `spacing` tiles, the densest thing to hook and bump into
+    map = open_field(width, height)
+    tiles = map.game_layer().tiles
+    tiles[2:height - 3:spacing, 2:width - 2:spacing, 0] = GameTileType.HOOKABLE
+    map.game_layer().tiles = tiles
+    return map
+
+def tele_maze(width: int = 200, height: int = 100, room: int = 10) -> Map:
+    """
+    Rooms `room` tiles wide split by walls. The right end of every room's
+    floor is a blue teleporter to the start of the next room, the last
+    room leads back to the first one.
+    """
+    map = open_field(width, height)
+    tiles = map.game_layer().tiles
+    tele = map.groups[0].layers.new_physics("Tele").tiles
+
+    rooms = (width - 2) // room
+    for i in range(rooms):
+        left = 1 + i * room
+        tiles[1:height - 1, left + room - 1, 0] = GameTileType.UNHOOKABLE
+        number = i % 255 + 1
+        # Teleporter on the floor by the wall, destination by the next room's entrance
+        tele[height - 2, left + room - 2] = number, TeleTileType.BLUE_TELE
+        target = 1 + (i + 1) % rooms * room
+        tele[height - 4, target + 1] = number, TeleTileType.TELE_DEST
+
+    map.game_layer().tiles = tiles
+    map.tele_layer().tiles = tele
+    return map
+
+def shaft(width: int = 8, height: int = 1000) -> Map:
+    # Narrow and tall, spawns at the top and a long fall to the floor
+    map, tiles = new_map(width, height)
+    tiles[:, :, 0] = GameTileType.EMPTY
+    tiles[:, 0, 0] = GameTileType.HOOKABLE
+    tiles[:, width - 1, 0] = GameTileType.HOOKABLE
+    tiles[0, :, 0] = GameTileType.UNHOOKABLE
+    tiles[height - 1, :, 0] = GameTileType.UNHOOKABLE
+    tiles[1, 1:width - 1, 0] = GameTileType.SPAWN
+    map.game_layer().tiles = tiles
+    return map
+
+# Name -> builder taking (width, height)
+MAPS = {
+    "open_field": open_field,
+    "scattered": scattered,
+    "lattice": lattice,
+    "tele_maze": tele_maze,
+    "shaft": lambda width, height: shaft(max(width // 25, 8), height * 10),
+}
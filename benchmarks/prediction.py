@@ -0,0 +1,92 @@
+"""
+Prediction error and cost of engine.prediction.DeadReckoning.
+
+    python -m benchmarks.prediction --tees 16 --ticks 3000 --rate 5 --latency 10
+
+A server engine runs tees on random inputs. Every `rate` ticks its
+snapshot is sent to the client, arriving `latency` ticks later. The client
+predicts every tick. Reported:
+    error         distance between predicted and true positions every tick
+    snapshot      prediction error for a snapshot's own tick when it arrives
+    cost          predictor time per tee and tick, resimulation included
+    tees_in_budget how many remote tees fit in --budget-ms per tick
+"""
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+from benchmarks.maps import save_temp, scattered
+from engine.engine import DDNetPhysicsEngine
+from engine.maploader import MapLoader
+from engine.prediction import DeadReckoning
+from engine.run import random_inputs, spawn_tees
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"mean": 0.0, "p95": 0.0, "max": 0.0}
+    values = np.asarray(values)
+    return {"mean": float(values.mean()), "p95": float(np.percentile(values, 95)), "max": float(values.max())}
+
+def run(map: MapLoader, tees: int, ticks: int, rate: int, latency: int, seed: int = 0) -> dict:
+    server = DDNetPhysicsEngine(map, spawn_tees(map, tees, seed))
+    inputs = random_inputs(seed)
+    client = DeadReckoning(map, tees, history=latency + rate + 2)
+
+    in_flight = deque()
+    errors = []
+    snapshot_errors = []
+    spent = 0.0
+
+    # The client starts from the server's first state
+    client.receive(0, server.snapshot())
+
+    for tick in range(ticks):
+        inputs(tick, server.players)
+        server.tick(1/50)
+        if server.tick_count % rate == 0:
+            in_flight.append((server.tick_count + latency, server.tick_count, server.snapshot()))
+
+        start = time.perf_counter()
+        client.step()
+        while in_flight and in_flight[0][0] <= server.tick_count:
+            _, sent, snapshot = in_flight.popleft()
+            error = client.receive(sent, snapshot)
+            if error is not None:
+                snapshot_errors.append(error)
+        spent += time.perf_counter() - start
+
+        truth = server.snapshot()["position"]
+        predicted = client.engine.snapshot()["position"]
+        errors.extend(np.hypot(*(predicted - truth).T).tolist())
+
+    cost = spent / (ticks * tees)
+    return {
+        "error": percentiles(errors),
+        "snapshot_error": percentiles(snapshot_errors),
+        "cost_us_per_tee_tick": cost * 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tees", type=int, default=16)
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--rate", type=int, default=5, help="ticks between snapshots")
+    parser.add_argument("--latency", type=int, default=10, help="ticks until a snapshot arrives")
+    parser.add_argument("--budget-ms", type=float, default=2.0, help="prediction time allowed per tick")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    map = MapLoader(save_temp(scattered()), use_cache=False)
+    result = run(map, args.tees, args.ticks, args.rate, args.latency, args.seed)
+
+    for name in ("error", "snapshot_error"):
+        stats = result[name]
+        print(f"{name:>16}: mean {stats['mean']:.2f}  p95 {stats['p95']:.2f}  max {stats['max']:.2f} units")
+    cost = result["cost_us_per_tee_tick"]
+    print(f"{'cost':>16}: {cost:.1f} us per tee and tick")
+    print(f"{'tees_in_budget':>16}: {int(args.budget_ms * 1000 / cost)} within {args.budget_ms} ms per tick")
+
+if __name__ == "__main__":
+    main()
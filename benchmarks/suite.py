@@ -0,0 +1,147 @@
+"""
+Physics benchmark suite over synthetic maps.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --maps lattice --tees 16 256 --baseline results.json
+
+For every map kind and size the map is built in memory and saved to a temp
+file. Its load time is measured cold (parsed and compiled) and from the
+compiled cache. Each tee population is then run with scripted running,
+jumping and hooking. The run reports ticks per second and the time of each
+engine phase per tick.
+
+Results are written as JSON. With --baseline, each result is compared with
+the matching map, size and population of an earlier run.
+"""
+import argparse
+import datetime
+import json
+import platform
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.maps import MAPS, save_temp
+from engine.engine import DDNetPhysicsEngine
+from engine.maploader import MapLoader
+from engine.run import spawn_tees
+from engine.tee import Tee
+
+SIZES = {
+    "small": (100, 50),
+    "large": (500, 250),
+}
+POPULATIONS = (1, 16, 256, 4096)
+PHASES = ("tick_players", "interact_players", "move_players", "post_tick_players")
+
+def scripted_inputs(tick: int, tees: list[Tee]):
+    # Every tee runs back and forth, jumps now and then and hooks upwards
+    for i, tee in enumerate(tees):
+        phase = (tick + i * 13) % 100
+        tee.direction = 1 if phase < 50 else -1
+        tee.should_jump = phase % 25 == 0
+        tee.should_hook = 20 <= phase < 70
+        tee.target.set(200 * tee.direction, -300)
+
+def load_times(path: str) -> dict:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        MapLoader(path, cache_dir=cache_dir)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        map = MapLoader(path, cache_dir=cache_dir)
+        cached = time.perf_counter() - start
+    return {"cold_seconds": cold, "cached_seconds": cached, "map": map}
+
+def run_population(map: MapLoader, tees: int, ticks: int) -> dict:
+    engine = DDNetPhysicsEngine(map, spawn_tees(map, tees, seed=0))
+
+    # Time every phase through the engine's own phase methods
+    phase_time = dict.fromkeys(PHASES, 0.0)
+    for name in PHASES:
+        def timed(*args, _phase=getattr(engine, name), _name=name):
+            start = time.perf_counter()
+            _phase(*args)
+            phase_time[_name] += time.perf_counter() - start
+        setattr(engine, name, timed)
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        scripted_inputs(tick, engine.players)
+        engine.tick(1/50)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "tees": tees,
+        "ticks": ticks,
+        "seconds": elapsed,
+        "ticks_per_second": ticks / elapsed,
+        "tee_ticks_per_second": ticks * tees / elapsed,
+        "phase_ms_per_tick": {name: seconds / ticks * 1e3 for name, seconds in phase_time.items()},
+    }
+
+def run_suite(maps: list[str], sizes: list[str], populations: list[int], tee_ticks: int, min_ticks: int) -> list[dict]:
+    results = []
+    for kind in maps:
+        for size in sizes:
+            width, height = SIZES[size]
+            path = save_temp(MAPS[kind](width, height), kind)
+            load = load_times(path)
+            map = load.pop("map")
+            for tees in populations:
+                ticks = max(min_ticks, tee_ticks // tees)
+                result = {"map": kind, "size": size, "width": map.width, "height": map.height, "load": load}
+                result.update(run_population(map, tees, ticks))
+                results.append(result)
+                print(f"{kind:>10} {size:>5} {tees:>5} tees: {result['ticks_per_second']:9.1f} ticks/s "
+                      f"{result['tee_ticks_per_second']:10.0f} tee ticks/s  load {load['cold_seconds'] * 1e3:.1f} ms "
+                      f"cold, {load['cached_seconds'] * 1e3:.1f} ms cached", flush=True)
+    return results
+
+def compare(results: list[dict], baseline: dict):
+    key = lambda r: (r["map"], r["size"], r["tees"])
+    previous = {key(r): r for r in baseline["results"]}
+    print("\nagainst baseline (ticks/s, higher is better)")
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        ratio = result["ticks_per_second"] / old["ticks_per_second"]
+        print(f"{result['map']:>10} {result['size']:>5} {result['tees']:>5} tees: "
+              f"{old['ticks_per_second']:9.1f} -> {result['ticks_per_second']:9.1f}  x{ratio:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maps", nargs="+", choices=list(MAPS), default=["open_field", "lattice", "tele_maze", "shaft"])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--tees", nargs="+", type=int, default=list(POPULATIONS))
+    parser.add_argument("--tee-ticks", type=int, default=20000, help="tee ticks simulated per population")
+    parser.add_argument("--min-ticks", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    results = run_suite(args.maps, args.sizes, args.tees, args.tee_ticks, args.min_ticks)
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
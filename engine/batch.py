@@ -0,0 +1,65 @@
+"""
+Replays many input logs of one map over a process pool.
+
+    python -m engine.batch maps/Volleyball_v2.map runs/*.pdil --workers 8
+
+The map is compiled once and shared with the workers (engine.sharedmap).
+One JSON line per log is printed as results come in, in the order of the
+logs: its tick count, the final positions and a checksum of the final
+states to compare between physics versions.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from engine.inputlog import InputLog, replay, state_checksum
+from engine.sharedmap import SharedMap
+
+# Map of the worker process, attached once by _attach
+_shared: SharedMap | None = None
+
+def _attach(spec: tuple[str, dict[str, tuple]]):
+    global _shared
+    _shared = SharedMap.attach(spec)
+
+def replay_file(map, path: str) -> dict:
+    try:
+        log = InputLog.read(path)
+        engine = replay(map, log)
+    except (OSError, ValueError) as e:
+        return {"log": path, "error": str(e)}
+
+    return {
+        "log": path,
+        "ticks": engine.tick_count,
+        "positions": [[tee.position.x, tee.position.y] for tee in engine.players],
+        "checksum": state_checksum(engine.players),
+    }
+
+def _replay_shared(path: str) -> dict:
+    return replay_file(_shared.map, path)
+
+def replay_many(map_path: str, logs: Iterable[str], workers: int | None = None, chunksize: int = 8) -> Iterator[dict]:
+    """
+    Yields replay_file results for every log, in order, while the pool
+    works on the next ones.
+    """
+    with SharedMap.create(map_path) as shared:
+        with ProcessPoolExecutor(workers, initializer=_attach, initargs=(shared.spec,)) as pool:
+            yield from pool.map(_replay_shared, logs, chunksize=chunksize)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("map")
+    parser.add_argument("logs", nargs="+")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=8)
+    args = parser.parse_args()
+
+    for result in replay_many(args.map, args.logs, args.workers, args.chunksize):
+        print(json.dumps(result), flush=True)
+
+if __name__ == "__main__":
+    main()
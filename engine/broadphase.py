@@ -0,0 +1,70 @@
+import math
+
+from shared import Vector2
+
+class SpatialHash:
+    """
+    Uniform grid of tee positions for tee-tee queries. Each tee sits in the
+    bucket of the cell its position is in, so a query only looks at the
+    buckets around the searched area and costs as much as the local crowd,
+    not the whole server.
+
+    `tees` is indexed like DDNet client ids, queries return indices into
+    it in increasing order. Call `update(i)` whenever tee i moved and
+    `rebuild()` when the list itself changes.
+    """
+    def __init__(self, tees: list, cell_size: float = 64):
+        self.tees = tees
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        self.keys: list[tuple[int, int]] = []
+        self.rebuild()
+
+    def _key(self, pos: Vector2) -> tuple[int, int]:
+        return math.floor(pos.x / self.cell_size), math.floor(pos.y / self.cell_size)
+
+    def rebuild(self):
+        self.cells.clear()
+        self.keys = [self._key(tee.position) for tee in self.tees]
+        for i, key in enumerate(self.keys):
+            self.cells.setdefault(key, []).append(i)
+
+    def update(self, index: int):
+        key = self._key(self.tees[index].position)
+        old = self.keys[index]
+        if key == old:
+            return
+
+        bucket = self.cells[old]
+        bucket.remove(index)
+        if not bucket:
+            del self.cells[old]
+        self.cells.setdefault(key, []).append(index)
+        self.keys[index] = key
+
+    def query(self, x0: float, y0: float, x1: float, y1: float, radius: float) -> list[int]:
+        """
+        Tees that may be within radius of the box spanned by (x0, y0) and
+        (x1, y1), pass the same point twice for a circle. Callers do the
+        exact distance test.
+        """
+        size = self.cell_size
+        cx0 = math.floor((min(x0, x1) - radius) / size)
+        cx1 = math.floor((max(x0, x1) + radius) / size)
+        cy0 = math.floor((min(y0, y1) - radius) / size)
+        cy1 = math.floor((max(y0, y1) + radius) / size)
+
+        found = []
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            # Huge areas, walk the occupied buckets instead
+            for (cx, cy), bucket in self.cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    found.extend(bucket)
+        else:
+            for cy in range(cy0, cy1 + 1):
+                for cx in range(cx0, cx1 + 1):
+                    bucket = self.cells.get((cx, cy))
+                    if bucket:
+                        found.extend(bucket)
+        found.sort()
+        return found
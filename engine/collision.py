@@ -0,0 +1,282 @@
+import math
+import numpy as np
+
+from engine.constants import *
+from engine.maploader import TILE_SHIFT, MapLoader
+from shared import Vector2
+
+RESOLVERS = ("stepped", "swept")
+
+def _tile(v: float) -> int:
+    return math.floor(v) >> TILE_SHIFT
+
+def _crossing(x: float, v: float, c0: int, c1: int, half: float) -> float:
+    # Fraction of v until the box enters the next column (or row)
+    if v > 0:
+        return ((c1 + 1) * UNITS_PER_TILE - (x + half)) / v
+    if v < 0:
+        return (c0 * UNITS_PER_TILE - (x - half)) / v
+    return math.inf
+
+def _solid_line(map: MapLoader, fixed: int, c0: int, c1: int, column: bool) -> bool:
+    for c in range(c0, c1 + 1):
+        if map.is_solid_cell(fixed, c) if column else map.is_solid_cell(c, fixed):
+            return True
+    return False
+
+def _stop_before(boundary: int, half: float) -> float:
+    # Largest x whose box still ends in the tile left of (or above) boundary
+    x = boundary - half
+    while _tile(x + half) >= boundary >> TILE_SHIFT:
+        x = math.nextafter(x, -math.inf)
+    return x
+
+def move_box_swept(pos: Vector2, vel: Vector2, map: MapLoader):
+    """
+    Alternative to Tee._move_box. Instead of stepping in unit sized
+    substeps, the box jumps from one tile boundary crossing to the next
+    and only the cells it is about to enter are tested. A blocked axis has
+    its velocity zeroed like in the stepping resolver, touching both axes
+    only on a pure corner hit, but the box stops against the tile instead
+    of up to a substep before it. Boxes already overlapping a solid tile
+    are only stopped by the cells they enter.
+    Moves pos and vel in place.
+    """
+    grounded = False
+    half = HITBOX_SIZE / 2
+
+    x = pos.x
+    y = pos.y
+    cx0, cx1 = _tile(x - half), _tile(x + half)
+    cy0, cy1 = _tile(y - half), _tile(y + half)
+
+    remaining = 1.0
+    while True:
+        # Decide on the end position whether a boundary is crossed at all,
+        # the crossing times only order the events
+        end_x = x + vel.x * remaining
+        end_y = y + vel.y * remaining
+        cross_x = _tile(end_x + half) > cx1 if vel.x > 0 else _tile(end_x - half) < cx0
+        cross_y = _tile(end_y + half) > cy1 if vel.y > 0 else _tile(end_y - half) < cy0
+        if not cross_x and not cross_y:
+            x, y = end_x, end_y
+            break
+
+        tx = _crossing(x, vel.x, cx0, cx1, half) if cross_x else math.inf
+        ty = _crossing(y, vel.y, cy0, cy1, half) if cross_y else math.inf
+        t = min(tx, ty)
+
+        enter_x = tx == t
+        enter_y = ty == t
+        remaining = max(remaining - t, 0.0)
+
+        # Advance to the crossing, snapping the crossing axis onto the boundary
+        if enter_x:
+            column = cx1 + 1 if vel.x > 0 else cx0 - 1
+            bx = (cx1 + 1 if vel.x > 0 else cx0) * UNITS_PER_TILE
+            x = bx - half if vel.x > 0 else bx + half
+        else:
+            x += vel.x * t
+        if enter_y:
+            row = cy1 + 1 if vel.y > 0 else cy0 - 1
+            by = (cy1 + 1 if vel.y > 0 else cy0) * UNITS_PER_TILE
+            y = by - half if vel.y > 0 else by + half
+        else:
+            y += vel.y * t
+
+        # The trailing side may have left a row or column on the way
+        if vel.x > 0:
+            cx0 = _tile(x - half)
+        elif vel.x < 0:
+            cx1 = _tile(x + half)
+        if vel.y > 0:
+            cy0 = _tile(y - half)
+        elif vel.y < 0:
+            cy1 = _tile(y + half)
+
+        block_x = enter_x and _solid_line(map, column, cy0, cy1, column=True)
+        block_y = enter_y and _solid_line(map, row, cx0, cx1, column=False)
+        if enter_x and enter_y and not block_x and not block_y and map.is_solid_cell(column, row):
+            block_x = block_y = True
+
+        if enter_x:
+            if block_x:
+                # Flush against the tile going left or up, just short of it going right or down
+                if vel.x > 0:
+                    x = _stop_before(bx, half)
+                vel.x *= 0
+            elif vel.x > 0:
+                cx1 = column
+            else:
+                cx0 = column
+
+        if enter_y:
+            if block_y:
+                # Flush against the tile going left or up, just short of it going right or down
+                if vel.y > 0:
+                    y = _stop_before(by, half)
+                vel.y *= 0
+            elif vel.y > 0:
+                cy1 = row
+            else:
+                cy0 = row
+
+    pos.set(x, y)
+    return pos, vel, grounded
+
+# Hook samples are lerped, they can round over a grid line the segment only touches
+EDGE_EPSILON = 1e-6
+
+def _portion_solid(map: MapLoader, tx: int, ty: int, x0, y0, dx, dy, ta: float, tb: float) -> bool:
+    # Is the tile, or a neighbour the part [ta, tb] of the segment in it touches, solid
+    xa, xb = x0 + dx * ta, x0 + dx * tb
+    ya, yb = y0 + dy * ta, y0 + dy * tb
+    left = min(xa, xb) < tx * UNITS_PER_TILE + EDGE_EPSILON
+    right = max(xa, xb) > (tx + 1) * UNITS_PER_TILE - EDGE_EPSILON
+    up = min(ya, yb) < ty * UNITS_PER_TILE + EDGE_EPSILON
+    down = max(ya, yb) > (ty + 1) * UNITS_PER_TILE - EDGE_EPSILON
+
+    for ox, near_x in ((0, True), (-1, left), (1, right)):
+        for oy, near_y in ((0, True), (-1, up), (1, down)):
+            if near_x and near_y and map.is_solid_cell(tx + ox, ty + oy):
+                return True
+    return False
+
+def _scan_samples(map: MapLoader, x0, y0, x1, y1, end: int, first: int, last: int):
+    # The samples Tee._intersect_line_hook used to check one by one
+    for i in range(first, last + 1):
+        t = i / end
+        x = (x0 * (1 - t)) + (x1 * t)
+        y = (y0 * (1 - t)) + (y1 * t)
+        flags = map.flags_at(x, y)
+        if flags & TILE_SOLID:
+            if flags & TILE_HOOKABLE:
+                return 1, x, y
+            if i == 0:
+                return 2, x0, y0
+            t = (i - 1) / end
+            return 2, (x0 * (1 - t)) + (x1 * t), (y0 * (1 - t)) + (y1 * t)
+    return None
+
+def _traversal_start(x0, y0, dx, dy):
+    tx = math.floor(x0) >> TILE_SHIFT
+    ty = math.floor(y0) >> TILE_SHIFT
+    t_max_x = ((tx + (dx > 0)) * UNITS_PER_TILE - x0) / dx if dx else math.inf
+    t_max_y = ((ty + (dy > 0)) * UNITS_PER_TILE - y0) / dy if dy else math.inf
+    return tx, ty, t_max_x, t_max_y
+
+def intersect_line_hook(map: MapLoader, x0: float, y0: float, x1: float, y1: float) -> tuple[int, float, float]:
+    """
+    Same result as sampling every unit of the segment like DDNet's hook
+    does, but walks the tiles the segment crosses (Amanatides & Woo) with
+    one lookup each, only evaluating samples around solid tiles.
+    Returns the hit (0 none, 1 hookable, 2 unhookable) and where it stops.
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    end = int(math.sqrt(dx * dx + dy * dy) + 1)
+
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    delta_x = UNITS_PER_TILE / abs(dx) if dx else math.inf
+    delta_y = UNITS_PER_TILE / abs(dy) if dy else math.inf
+    tx, ty, t_max_x, t_max_y = _traversal_start(x0, y0, dx, dy)
+
+    ta = 0.0
+    scanned = -1
+    while True:
+        tb = min(t_max_x, t_max_y, 1.0)
+        if _portion_solid(map, tx, ty, x0, y0, dx, dy, ta, tb):
+            first = max(int(ta * end) - 1, scanned + 1)
+            last = min(math.ceil(tb * end) + 1, end)
+            found = _scan_samples(map, x0, y0, x1, y1, end, first, last)
+            if found is not None:
+                return found
+            scanned = last
+        if tb >= 1.0:
+            return 0, x1, y1
+
+        ta = tb
+        if t_max_x <= t_max_y:
+            tx += step_x
+            t_max_x += delta_x
+        if t_max_y <= ta:
+            ty += step_y
+            t_max_y += delta_y
+
+def intersect_lines_hook(map: MapLoader, pos0: np.ndarray, pos1: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batched intersect_line_hook for (n, 2) arrays of segments. All segments
+    walk their tiles together, the few that come near a solid tile are
+    then resolved one by one.
+    """
+    hit = np.zeros(len(pos0), dtype=np.int64)
+    point = pos1.copy()
+
+    for i in np.flatnonzero(_touch_solid(map, pos0, pos1)).tolist():
+        (x0, y0), (x1, y1) = pos0[i].tolist(), pos1[i].tolist()
+        hit[i], point[i, 0], point[i, 1] = intersect_line_hook(map, x0, y0, x1, y1)
+    return hit, point
+
+def _touch_solid(map: MapLoader, pos0: np.ndarray, pos1: np.ndarray) -> np.ndarray:
+    # Vectorized traversal of intersect_line_hook, True where it would look at samples
+    x0, y0 = pos0[:, 0], pos0[:, 1]
+    dx, dy = pos1[:, 0] - x0, pos1[:, 1] - y0
+
+    tx = np.floor(x0).astype(np.int64) >> TILE_SHIFT
+    ty = np.floor(y0).astype(np.int64) >> TILE_SHIFT
+    step_x = np.where(dx > 0, 1, -1)
+    step_y = np.where(dy > 0, 1, -1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_max_x = np.where(dx != 0, ((tx + (dx > 0)) * UNITS_PER_TILE - x0) / dx, np.inf)
+        t_max_y = np.where(dy != 0, ((ty + (dy > 0)) * UNITS_PER_TILE - y0) / dy, np.inf)
+        delta_x = np.where(dx != 0, UNITS_PER_TILE / np.abs(dx), np.inf)
+        delta_y = np.where(dy != 0, UNITS_PER_TILE / np.abs(dy), np.inf)
+
+    ta = np.zeros(len(pos0))
+    touched = np.zeros(len(pos0), dtype=bool)
+    active = np.arange(len(pos0))
+    while active.size:
+        a = active
+        tb = np.minimum(np.minimum(t_max_x[a], t_max_y[a]), 1.0)
+
+        xa, xb = x0[a] + dx[a] * ta[a], x0[a] + dx[a] * tb
+        ya, yb = y0[a] + dy[a] * ta[a], y0[a] + dy[a] * tb
+        near_x = (
+            (0, True),
+            (-1, np.minimum(xa, xb) < tx[a] * UNITS_PER_TILE + EDGE_EPSILON),
+            (1, np.maximum(xa, xb) > (tx[a] + 1) * UNITS_PER_TILE - EDGE_EPSILON)
+        )
+        near_y = (
+            (0, True),
+            (-1, np.minimum(ya, yb) < ty[a] * UNITS_PER_TILE + EDGE_EPSILON),
+            (1, np.maximum(ya, yb) > (ty[a] + 1) * UNITS_PER_TILE - EDGE_EPSILON)
+        )
+        solid = np.zeros(a.size, dtype=bool)
+        for ox, nx in near_x:
+            for oy, ny in near_y:
+                flags = map.flags_at_tiles(tx[a] + ox, ty[a] + oy)
+                solid |= nx & ny & (flags & TILE_SOLID != 0)
+        touched[a] = solid
+
+        a = a[~solid & (tb < 1.0)]
+        ta[a] = tb[~solid & (tb < 1.0)]
+        move_x = t_max_x[a] <= t_max_y[a]
+        tx[a] += np.where(move_x, step_x[a], 0)
+        t_max_x[a] += np.where(move_x, delta_x[a], 0)
+        move_y = t_max_y[a] <= ta[a]
+        ty[a] += np.where(move_y, step_y[a], 0)
+        t_max_y[a] += np.where(move_y, delta_y[a], 0)
+        active = a
+    return touched
+
+def closest_point_on_line(x0: float, y0: float, x1: float, y1: float, px: float, py: float) -> tuple[float, float] | None:
+    # Point of the segment closest to (px, py), None for an empty segment
+    abx = x1 - x0
+    aby = y1 - y0
+    squared = abx * abx + aby * aby
+    if squared > 0:
+        t = ((px - x0) * abx + (py - y0) * aby) / squared
+        t = min(max(t, 0.0), 1.0)
+        return x0 + abx * t, y0 + aby * t
+    return None
@@ -5,6 +5,32 @@ PIXELS_PER_UNIT = PIXELS_PER_TILE / UNITS_PER_TILE  # 2.0
 
 HITBOX_SIZE = 28  # in units
 
+# Collision grid flags (one uint8 per map cell)
+TILE_SOLID = 1 << 0
+TILE_HOOKABLE = 1 << 1
+TILE_DEATH = 1 << 2
+TILE_FREEZE = 1 << 3
+TILE_UNFREEZE = 1 << 4
+TILE_TELE = 1 << 5
+TILE_TELE_DEST = 1 << 6
+TILE_CHECKPOINT = 1 << 7
+
+# Tile events of a map cell, one uint16 mask per cell read by post_tick
+TRIGGER_DEATH = 1 << 0
+TRIGGER_FREEZE = 1 << 1
+TRIGGER_DEEP_FREEZE = 1 << 2
+TRIGGER_UNFREEZE = 1 << 3
+TRIGGER_UNDEEP = 1 << 4
+TRIGGER_TELE = 1 << 5       # to a destination of the tele's number
+TRIGGER_CP_TELE = 1 << 6    # to a destination of the last checkpoint
+TRIGGER_TELE_STOP = 1 << 7  # red teles also stop the tee
+TRIGGER_CHECKPOINT = 1 << 8
+
+# Events that move the tee somewhere else
+TRIGGER_MOVES = TRIGGER_DEATH | TRIGGER_TELE | TRIGGER_CP_TELE
+
+FREEZE_TICKS = 3 * 50
+
 # Render (for compatibility)
 TILE_SIZE = PIXELS_PER_TILE
 
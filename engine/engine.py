@@ -1,28 +1,310 @@
+from engine.broadphase import SpatialHash
+from engine.collision import RESOLVERS
 from engine.constants import *
 from engine.maploader import MapLoader
+from engine.snapshot import TEE_STATE, SnapshotRing, pack_tee, pack_tees, unpack_tees
 from engine.tee import Tee
+from shared import HookState, Vector2
+
+# What update() does with ticks it is behind by more than max_catchup:
+# "drop" forgets them, "dilate" slows the game down and runs them later
+CATCHUP_POLICIES = ("drop", "dilate")
+MAX_CATCHUP_TICKS = 5
 
 class DDNetPhysicsEngine:
     def __init__(
         self,
         map: MapLoader,
-        players: list[Tee]
+        players: list[Tee],
+        resolver: str = "stepped",
+        player_collision: bool = True,
+        player_hooking: bool = True,
+        history: int = 0,
+        sleeping: bool = True,
+        max_catchup: int | None = MAX_CATCHUP_TICKS,
+        catchup: str = "dilate"
     ):
+        if resolver not in RESOLVERS:
+            raise ValueError(f"Unknown collision resolver: {resolver}")
+        if catchup not in CATCHUP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy: {catchup}")
+        if max_catchup is not None and max_catchup < 1:
+            raise ValueError("max_catchup must be at least 1 tick")
+        
         self.map = map
         self.players = players
+        self.resolver = resolver
+        self.player_collision = player_collision
+        self.player_hooking = player_hooking
+        self.broadphase = SpatialHash(players)
+        
+        # Called with the players before every tick, see engine.inputlog
+        self.recorder = None
+        # Tee index -> spawn, applied at the start of the next tick
+        self._respawns: dict[int, Vector2 | None] = {}
+        self.tick_count = 0
+        
+        # State at the start of each of the last `history` ticks, for rollback
+        self.history = SnapshotRing(history, len(players)) if history else None
         self.accumulated_time = 0.0
         
+        # How far the time update() got to is past the last tick, in ticks,
+        # and every tee's [x, y, hook x, hook y, teleports] before that tick
+        self.alpha = 0.0
+        self.previous: list[list] = []
+        
+        # Most ticks one update() runs, None for no limit. Ticks over it are
+        # counted in dropped_ticks, or in delayed_ticks each time they are
+        # put off to the next update
+        self.max_catchup = max_catchup
+        self.catchup = catchup
+        self.dropped_ticks = 0
+        self.delayed_ticks = 0
+        
+        # Tees at rest are skipped until something could move them, see _wake_tees
+        self.sleeping = sleeping
+        self.asleep = [False] * len(players)
+        self._resting = [False] * len(players)
+        self._states = [bytearray(TEE_STATE.size) for _ in players]
+        self._state = bytearray(TEE_STATE.size)
+        self._revision = map.revision
+        
     def update(self, dt):
         STEP_TIME = 1/50
         self.accumulated_time += dt
+        budget = self.max_catchup
+        ticks = 0
         while self.accumulated_time >= STEP_TIME:
+            if budget is not None and ticks == budget:
+                self._over_budget(STEP_TIME)
+                break
+            
+            # Only the last tick of a catch-up is drawn from
+            remaining = self.accumulated_time - STEP_TIME
+            if remaining < STEP_TIME or ticks + 1 == budget:
+                self._save_previous()
             self.tick(STEP_TIME)
-            self.accumulated_time -= STEP_TIME
+            self.accumulated_time = remaining
+            ticks += 1
+        # Held at 1 while a dilated backlog waits for the next update
+        self.alpha = min(self.accumulated_time / STEP_TIME, 1.0)
+        
+    def _over_budget(self, step_time):
+        behind = int(self.accumulated_time // step_time)
+        # Dilating keeps at most another update's worth of ticks
+        kept = min(behind, self.max_catchup) if self.catchup == "dilate" else 0
+        self.accumulated_time = max(self.accumulated_time - (behind - kept) * step_time, 0.0)
+        self.dropped_ticks += behind - kept
+        self.delayed_ticks += kept
+        
+    def _save_previous(self):
+        previous = self.previous
+        if len(previous) != len(self.players):
+            self.previous = previous = [[0.0, 0.0, 0.0, 0.0, 0] for _ in self.players]
+        for saved, player in zip(previous, self.players):
+            saved[0] = player.position.x
+            saved[1] = player.position.y
+            saved[2] = player.hookpos.x
+            saved[3] = player.hookpos.y
+            saved[4] = player.teleports
+            
+    def render_position(self, index: int) -> tuple[float, float]:
+        """
+        Where tee `index` is `alpha` of the way from its previous tick to
+        the last one, what to draw between ticks. Teleports aren't smoothed.
+        """
+        player = self.players[index]
+        return self._interpolate(index, player, player.position, 0)
+    
+    def render_hookpos(self, index: int) -> tuple[float, float]:
+        player = self.players[index]
+        return self._interpolate(index, player, player.hookpos, 2)
+    
+    def _interpolate(self, index: int, player: Tee, current, field: int) -> tuple[float, float]:
+        if index >= len(self.previous) or self.previous[index][4] != player.teleports:
+            return current.x, current.y
+        x = self.previous[index][field]
+        y = self.previous[index][field + 1]
+        return x + (current.x - x) * self.alpha, y + (current.y - y) * self.alpha
+        
+    def snapshot(self, out=None):
+        """
+        Every tee's state packed into a TEE_DTYPE array, see engine.snapshot.
+        """
+        return pack_tees(self.players, out)
+    
+    def respawn(self, index: int, spawn: Vector2 | None):
+        """
+        Starts tee `index` over at spawn when the next tick starts, see
+        Tee.die. Unlike moving the tee directly this is in the input log.
+        """
+        self._respawns[index] = spawn
+        
+    def restore(self, snapshot):
+        unpack_tees(snapshot, self.players)
+        self._moved_all()
+        
+    def rollback(self, ticks: int):
+        """
+        Goes back to the start of the tick `ticks` ticks ago, tick() again to
+        re-simulate from there. Needs a history of at least that many ticks.
+        """
+        if self.history is None:
+            raise ValueError("Engine was made without history")
+        # The log is written as it goes, ticks run again would be in it twice
+        if self.recorder is not None:
+            raise ValueError("Can't roll back while recording inputs")
+        
+        # The accumulator is wall clock time still to simulate, ticks
+        # replayed after this don't change how much of it there is
+        tick = self.tick_count - ticks
+        self.history.load(tick, self.players)
+        self.tick_count = tick
+        self._moved_all()
+        
+    def _moved_all(self):
+        # Nothing to draw from before a jump in state
+        self.previous = []
+        for i in range(len(self.players)):
+            self.broadphase.update(i)
         
     def tick(self, dt):
-        for player in self.players:
-            player.tick(dt, self.map)
+        broadphase = self.broadphase
+        if broadphase.tees is not self.players or len(broadphase.keys) != len(self.players):
+            broadphase.tees = self.players
+            broadphase.rebuild()
+            
+        if len(self.asleep) != len(self.players):
+            self.asleep = [False] * len(self.players)
+            self._resting = [False] * len(self.players)
+            self._states = [bytearray(TEE_STATE.size) for _ in self.players]
+            
+        # Before the history, re-simulating from this tick keeps the respawn
+        respawns = self._respawns
+        if respawns:
+            self._respawns = {}
+            for i, spawn in respawns.items():
+                self.players[i].die(spawn)
+                broadphase.update(i)
+                
+        if self.history is not None:
+            # Snapshots of another set of tees can't be rolled back to
+            if self.history.states.shape[1] != len(self.players):
+                self.history = SnapshotRing(self.history.capacity, len(self.players))
+            self.history.save(self.tick_count, self.players)
+            
+        if self.recorder is not None:
+            self.recorder.record(self.players, respawns)
+            
+        # Like DDNet, every tee ticks, then interacts, then moves
+        if self.sleeping:
+            self._wake_tees()
+            
+        self.tick_players(dt)
+        self.interact_players()
+        self.move_players(dt)
+        self.post_tick_players(dt)
+        
+        if self.sleeping:
+            self._rest_tees()
+        
+        self.tick_count += 1
+        
+    def _wake_tees(self):
+        """
+        A tee whose tick left its whole state unchanged, with no tee close
+        enough to push it and none hooking it, ticks to the same state again
+        as long as that holds. Such tees sleep through the tick, everyone
+        else is checked here for coming to rest.
+        """
+        if self.map.revision != self._revision:
+            self._revision = self.map.revision
+            self.asleep = [False] * len(self.players)
+            
+        asleep = self.asleep
+        resting = self._resting
+        state = self._state
+        for i, player in enumerate(self.players):
+            resting[i] = False
+            if not asleep[i] and (player.velocity.x != 0 or player.velocity.y != 0):
+                continue
+            
+            # Also catches new inputs and tees moved from outside the engine
+            pack_tee(state, 0, player)
+            alone = self._alone(i, player)
+            if asleep[i]:
+                if alone and state == self._states[i]:
+                    continue
+                asleep[i] = False
+                
+            if alone:
+                self._states[i][:] = state
+                resting[i] = True
+                
+    def _alone(self, index: int, player: Tee) -> bool:
+        if not self.player_collision:
+            return True
+        x, y = player.position.x, player.position.y
+        return all(i == index for i in self.broadphase.query(x, y, x, y, HITBOX_SIZE * 1.25))
+    
+    def _wake_hooked(self, dt):
+        # A tee grabbed this tick is dragged in interact, so it has to tick
+        # after all. Resting tees never read other tees while ticking.
+        hooked = {player.hooked_player for player in self.players}
+        hooked.discard(-1)
+        hooking = self.broadphase if self.player_hooking else None
+        for i in hooked:
+            if i < len(self.players):
+                if self.asleep[i]:
+                    self.asleep[i] = False
+                    self.players[i].tick(dt, self.map, hooking)
+                self._resting[i] = False
+                
+    def _rest_tees(self):
+        state = self._state
+        for i, player in enumerate(self.players):
+            if not self._resting[i] or self.asleep[i]:
+                continue
+            if player.velocity.x != 0 or player.velocity.y != 0:
+                continue
+            if player.hook_state not in (HookState.IDLE, HookState.RETRACTED):
+                continue
+            # Teleporters or dying could move the tee and put it back within the tick
+            if self.map.triggers_at(player.position.x, player.position.y) & TRIGGER_MOVES:
+                continue
+            
+            pack_tee(state, 0, player)
+            if state == self._states[i]:
+                self.asleep[i] = True
+        
+    def tick_players(self, dt):
+        hooking = self.broadphase if self.player_hooking else None
+        asleep = self.asleep
+        for i, player in enumerate(self.players):
+            if not asleep[i]:
+                player.tick(dt, self.map, hooking)
+                
+        if self.sleeping and self.player_hooking:
+            self._wake_hooked(dt)
             
-            player.move(dt, self.map)
+    def interact_players(self):
+        if self.player_collision or self.player_hooking:
+            asleep = self.asleep
+            for i, player in enumerate(self.players):
+                if not asleep[i]:
+                    player.interact(self.broadphase, self.player_collision, self.player_hooking)
+                
+    def move_players(self, dt):
+        colliding = self.broadphase if self.player_collision else None
+        asleep = self.asleep
+        for i, player in enumerate(self.players):
+            if not asleep[i]:
+                player.move(dt, self.map, self.resolver, colliding)
+                self.broadphase.update(i)
             
-            player.post_tick(dt, self.map)
\ No newline at end of file
+    def post_tick_players(self, dt):
+        asleep = self.asleep
+        for i, player in enumerate(self.players):
+            if not asleep[i]:
+                player.post_tick(dt, self.map)
+                self.broadphase.update(i)
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+Compact binary log of the inputs fed to the tees every tick, to replay a
+run through DDNetPhysicsEngine and get the same result.
+
+Layout, little endian:
+
+    header  b"PDIL", u8 version, u8 resolver, u8 options, u16 tee count,
+            varint + utf-8 map name, then position and velocity as 4 f64
+            per tee
+    frame   varint ticks without any input change before this one,
+            varint changes, then the changes of this tick
+    change  varint tee, u8 mask of the changed inputs, i8 direction when
+            DIRECTION is set, 2 f64 target when TARGET is set, 2 f64
+            position when RESPAWN is set (version 2). Jump and hook are
+            carried by the JUMP_ON and HOOK_ON bits.
+    end     varint trailing ticks without changes, varint 0
+
+Only changed inputs are stored and unchanged ticks collapse into a count,
+so a typical run costs a few bytes per input change.
+"""
+import hashlib
+import struct
+from typing import BinaryIO, Iterator
+
+from engine.collision import RESOLVERS
+from engine.engine import DDNetPhysicsEngine
+from engine.maploader import MapLoader
+from engine.tee import Tee
+from shared import Vector2
+
+MAGIC = b"PDIL"
+VERSION = 2
+
+# Change mask bits
+DIRECTION = 1 << 0
+TARGET = 1 << 1
+JUMP = 1 << 2
+HOOK = 1 << 3
+JUMP_ON = 1 << 4
+HOOK_ON = 1 << 5
+# The tee died and started over at the given position before the tick
+RESPAWN = 1 << 6
+
+# Engine option bits
+PLAYER_COLLISION = 1 << 0
+PLAYER_HOOKING = 1 << 1
+
+HEADER = struct.Struct("<4sBBBH")
+STATE = struct.Struct("<4d")
+TARGET_VALUE = struct.Struct("<2d")
+
+# direction, target x, target y, should_jump, should_hook
+Inputs = tuple[int, float, float, bool, bool]
+DEFAULT_INPUTS: Inputs = (0, 0.0, 0.0, False, False)
+
+def tee_inputs(tee: Tee) -> Inputs:
+    return tee.direction, tee.target.x, tee.target.y, tee.should_jump, tee.should_hook
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Truncated input log")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+class InputRecorder:
+    """
+    Writes the inputs of the engine's players every tick, set it as
+    `engine.recorder`. The start state is taken when the recorder is made,
+    make it before the first tick: only positions and velocities are kept.
+    """
+    def __init__(self, file: BinaryIO, engine: DDNetPhysicsEngine, map_name: str = ""):
+        self.file = file
+        self.tees = len(engine.players)
+        self.last = [DEFAULT_INPUTS] * self.tees
+        self.unchanged = 0
+        self.ticks = 0
+        self.closed = False
+
+        options = (PLAYER_COLLISION if engine.player_collision else 0) | (PLAYER_HOOKING if engine.player_hooking else 0)
+        out = bytearray(HEADER.pack(MAGIC, VERSION, RESOLVERS.index(engine.resolver), options, self.tees))
+        name = map_name.encode()
+        _write_varint(out, len(name))
+        out += name
+        for tee in engine.players:
+            out += STATE.pack(tee.position.x, tee.position.y, tee.velocity.x, tee.velocity.y)
+        self.file.write(out)
+
+    @classmethod
+    def open(cls, path: str, engine: DDNetPhysicsEngine, map_name: str = "") -> "InputRecorder":
+        return cls(open(path, "wb"), engine, map_name)
+
+    def record(self, tees: list[Tee], respawns: dict[int, Vector2 | None] | None = None):
+        if len(tees) != self.tees:
+            raise ValueError(f"Recording {self.tees} tees, got {len(tees)}")
+
+        changes = bytearray()
+        count = 0
+        for i, tee in enumerate(tees):
+            inputs = tee_inputs(tee)
+            last = self.last[i]
+            respawned = bool(respawns) and i in respawns
+            if inputs == last and not respawned:
+                continue
+
+            mask = (JUMP_ON if inputs[3] else 0) | (HOOK_ON if inputs[4] else 0)
+            if respawned:
+                mask |= RESPAWN
+            if inputs[0] != last[0]:
+                mask |= DIRECTION
+            if inputs[1] != last[1] or inputs[2] != last[2]:
+                mask |= TARGET
+            if inputs[3] != last[3]:
+                mask |= JUMP
+            if inputs[4] != last[4]:
+                mask |= HOOK
+
+            _write_varint(changes, i)
+            changes.append(mask)
+            if mask & DIRECTION:
+                changes += struct.pack("<b", inputs[0])
+            if mask & TARGET:
+                changes += TARGET_VALUE.pack(inputs[1], inputs[2])
+            if mask & RESPAWN:
+                # Where the tee is now, also right when it died in place
+                changes += TARGET_VALUE.pack(tee.position.x, tee.position.y)
+            self.last[i] = inputs
+            count += 1
+
+        self.ticks += 1
+        if not count:
+            self.unchanged += 1
+            return
+
+        out = bytearray()
+        _write_varint(out, self.unchanged)
+        _write_varint(out, count)
+        self.file.write(out + changes)
+        self.unchanged = 0
+
+    def close(self):
+        if self.closed:
+            return
+        out = bytearray()
+        _write_varint(out, self.unchanged)
+        _write_varint(out, 0)
+        self.file.write(out)
+        self.file.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class InputLog:
+    def __init__(self, data: bytes):
+        if len(data) < HEADER.size:
+            raise ValueError("Truncated input log")
+        magic, version, resolver, options, tees = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not an input log")
+        if version not in (1, VERSION):
+            raise ValueError(f"Unsupported input log version: {version}")
+
+        self.data = data
+        self.resolver = RESOLVERS[resolver]
+        self.player_collision = bool(options & PLAYER_COLLISION)
+        self.player_hooking = bool(options & PLAYER_HOOKING)
+        self.tees = tees
+
+        length, offset = _read_varint(data, HEADER.size)
+        self.map_name = bytes(data[offset:offset + length]).decode()
+        offset += length
+
+        self.start: list[tuple[float, float, float, float]] = []
+        for _ in range(tees):
+            self.start.append(STATE.unpack_from(data, offset))
+            offset += STATE.size
+        self._body = offset
+
+    @classmethod
+    def read(cls, path: str) -> "InputLog":
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def spawn_tees(self) -> list[Tee]:
+        tees = []
+        for x, y, vx, vy in self.start:
+            tee = Tee()
+            tee.position = Vector2(x, y)
+            tee.velocity = Vector2(vx, vy)
+            tees.append(tee)
+        return tees
+
+    def engine(self, map: MapLoader) -> DDNetPhysicsEngine:
+        return DDNetPhysicsEngine(
+            map,
+            self.spawn_tees(),
+            resolver=self.resolver,
+            player_collision=self.player_collision,
+            player_hooking=self.player_hooking
+        )
+
+    def ticks(self) -> Iterator[list[tuple[int, int, int, float, float, float, float]]]:
+        """
+        Yields the changes of every tick, as (tee, mask, direction, target x,
+        target y, spawn x, spawn y) with only the fields named by the mask
+        meaningful.
+        """
+        data = self.data
+        offset = self._body
+        while True:
+            unchanged, offset = _read_varint(data, offset)
+            for _ in range(unchanged):
+                yield []
+            count, offset = _read_varint(data, offset)
+            if not count:
+                return
+
+            changes = []
+            for _ in range(count):
+                tee, offset = _read_varint(data, offset)
+                if tee >= self.tees or offset >= len(data):
+                    raise ValueError("Corrupt input log")
+                mask = data[offset]
+                offset += 1
+                direction = 0
+                target_x = target_y = spawn_x = spawn_y = 0.0
+                if mask & DIRECTION:
+                    direction = struct.unpack_from("<b", data, offset)[0]
+                    offset += 1
+                if mask & TARGET:
+                    target_x, target_y = TARGET_VALUE.unpack_from(data, offset)
+                    offset += TARGET_VALUE.size
+                if mask & RESPAWN:
+                    spawn_x, spawn_y = TARGET_VALUE.unpack_from(data, offset)
+                    offset += TARGET_VALUE.size
+                changes.append((tee, mask, direction, target_x, target_y, spawn_x, spawn_y))
+            yield changes
+
+def apply_changes(changes: list[tuple[int, int, int, float, float, float, float]], engine: DDNetPhysicsEngine):
+    # Respawns go through the engine to happen where they were recorded
+    for i, mask, direction, target_x, target_y, spawn_x, spawn_y in changes:
+        tee = engine.players[i]
+        if mask & RESPAWN:
+            engine.respawn(i, Vector2(spawn_x, spawn_y))
+        if mask & DIRECTION:
+            tee.direction = direction
+        if mask & TARGET:
+            tee.target.set(target_x, target_y)
+        if mask & JUMP:
+            tee.should_jump = bool(mask & JUMP_ON)
+        if mask & HOOK:
+            tee.should_hook = bool(mask & HOOK_ON)
+
+def replay(map: MapLoader, log: InputLog) -> DDNetPhysicsEngine:
+    """
+    Runs the log from its start state, returns the engine after the last tick.
+    """
+    engine = log.engine(map)
+    for changes in log.ticks():
+        apply_changes(changes, engine)
+        engine.tick(1/50)
+    return engine
+
+def state_checksum(tees: list[Tee]) -> str:
+    # Exact positions and velocities, any physics change shows up here
+    digest = hashlib.sha256()
+    for tee in tees:
+        digest.update(STATE.pack(tee.position.x, tee.position.y, tee.velocity.x, tee.velocity.y))
+    return digest.hexdigest()[:16]
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import zipfile
+import numpy as np
+
+# Bump whenever the arrays produced by MapLoader._compile change
+CACHE_VERSION = 4
+
+def map_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def cache_path(map_path: str, digest: str, cache_dir: str | None = None) -> str:
+    """
+    Compiled maps live next to the map unless a cache directory is given,
+    named after the map and the hash of its contents.
+    """
+    directory, name = os.path.split(map_path)
+    stem = os.path.splitext(name)[0]
+    return os.path.join(cache_dir or directory, f"{stem}.{digest[:16]}.npz")
+
+def load_compiled(path: str, digest: str) -> dict[str, np.ndarray] | None:
+    """
+    Returns the compiled map arrays, or None when the cache is missing,
+    unreadable or was written for another map or cache version.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            if int(f["version"]) != CACHE_VERSION or str(f["digest"]) != digest:
+                return None
+            return {key: f[key] for key in f.files if key not in ("version", "digest")}
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+def save_compiled(path: str, digest: str, arrays: dict[str, np.ndarray]):
+    # Failing to write the cache only costs a rebuild next time
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp, "wb") as f:
+            np.savez(f, version=CACHE_VERSION, digest=digest, **arrays)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -1,83 +1,377 @@
+import math
+import numpy as np
 from twmap import Map
 
-from engine.utils import get_tiles_mesh
+from engine.constants import *
+from engine.mapcache import cache_path, load_compiled, map_digest, save_compiled
+from engine.utils import TILE_UVS, TileArrays, TileGrid, TileList, get_tiles_arrays
 from shared import *
 
+# Per tile id collision flags, indexed by the raw layer id
+GAME_FLAGS = np.zeros(256, dtype=np.uint8)
+GAME_FLAGS[GameTileType.HOOKABLE] = TILE_SOLID | TILE_HOOKABLE
+GAME_FLAGS[GameTileType.UNHOOKABLE] = TILE_SOLID
+GAME_FLAGS[GameTileType.DEATH] = TILE_DEATH
+GAME_FLAGS[GameTileType.FREEZE] = TILE_FREEZE
+GAME_FLAGS[GameTileType.DEEPFREEZE] = TILE_FREEZE
+GAME_FLAGS[GameTileType.UNFREEZE] = TILE_UNFREEZE
+GAME_FLAGS[GameTileType.UNDEEP] = TILE_UNFREEZE
+
+TELE_FLAGS = np.zeros(256, dtype=np.uint8)
+for _type in (TeleTileType.RED_TELE, TeleTileType.BLUE_TELE, TeleTileType.CP_BLUE_TELE, TeleTileType.CP_RED_TELE):
+    TELE_FLAGS[_type] |= TILE_TELE
+for _type in (TeleTileType.TELE_DEST, TeleTileType.CP_TELE_DEST):
+    TELE_FLAGS[_type] |= TILE_TELE_DEST
+for _type in (TeleTileType.CHECKPOINT, TeleTileType.CP_TELE_DEST, TeleTileType.CP_BLUE_TELE, TeleTileType.CP_RED_TELE):
+    TELE_FLAGS[_type] |= TILE_CHECKPOINT
+
+# Per tile id events, see TRIGGER_*
+GAME_TRIGGERS = np.zeros(256, dtype=np.uint16)
+GAME_TRIGGERS[GameTileType.DEATH] = TRIGGER_DEATH
+GAME_TRIGGERS[GameTileType.FREEZE] = TRIGGER_FREEZE
+GAME_TRIGGERS[GameTileType.DEEPFREEZE] = TRIGGER_DEEP_FREEZE
+GAME_TRIGGERS[GameTileType.UNFREEZE] = TRIGGER_UNFREEZE
+GAME_TRIGGERS[GameTileType.UNDEEP] = TRIGGER_UNDEEP
+
+TELE_TRIGGERS = np.zeros(256, dtype=np.uint16)
+TELE_TRIGGERS[TeleTileType.BLUE_TELE] = TRIGGER_TELE
+TELE_TRIGGERS[TeleTileType.RED_TELE] = TRIGGER_TELE | TRIGGER_TELE_STOP
+TELE_TRIGGERS[TeleTileType.CP_BLUE_TELE] = TRIGGER_CP_TELE
+TELE_TRIGGERS[TeleTileType.CP_RED_TELE] = TRIGGER_CP_TELE | TRIGGER_TELE_STOP
+TELE_TRIGGERS[TeleTileType.CHECKPOINT] = TRIGGER_CHECKPOINT
+
+# Tile ids picked out by the tile views
+NON_EMPTY = np.arange(256) != 0
+SOLID_IDS = GAME_FLAGS & TILE_SOLID != 0
+TELEPORTER_IDS = TELE_FLAGS & TILE_TELE != 0
+DESTINATION_IDS = TELE_FLAGS & TILE_TELE_DEST != 0
+CHECKPOINT_IDS = (TELE_FLAGS & TILE_CHECKPOINT != 0) & ~TELEPORTER_IDS & ~DESTINATION_IDS
+
+SPAWN_IDS = (GameTileType.SPAWN, GameTileType.REDSPAWN, GameTileType.BLUESPAWN)
+DEST_IDS = (TeleTileType.TELE_DEST, TeleTileType.CP_TELE_DEST)
+
+# floor(x) >> TILE_SHIFT == floor(x / UNITS_PER_TILE), without the float division
+TILE_SHIFT = UNITS_PER_TILE.bit_length() - 1
+
 class MapLoader:
-    def __init__(self, map_path: str):
-        self.map = Map(map_path)
+    def __init__(
+        self,
+        map_path: str | None = None,
+        cache_dir: str | None = None,
+        use_cache: bool = True,
+        arrays: dict[str, np.ndarray] | None = None
+    ):
+        # Only parsed when the compiled map cache is missing or stale
+        self.map: Map | None = None
         
-        self.tiles: dict[tuple, list[Tile]] = {}
+        self.spawners: list[GameTile] = []
+        # World space centers of the spawners
+        self.spawn_points: list[Vector2] = []
         
-        # Unhookable and Hookable collidables
-        self.collidables: list[GameTile] = []
+        # Tele number -> world space centers of its destinations, in map order
+        self.tele_dests: dict[int, list[Vector2]] = {}
+        self.cp_dests: dict[int, list[Vector2]] = {}
         
-        self.spawners: list[GameTile] = []
+        # Dense grid of TILE_* flags, indexed [y, x] in tiles
+        self.width = 0
+        self.height = 0
+        self.grid = np.zeros((0, 0), dtype=np.uint8)
+        # Tile ids and flags of the layers, indexed [y, x]
+        self.game_ids = np.zeros((0, 0), dtype=np.uint8)
+        self.game_flags = np.zeros((0, 0), dtype=np.uint8)
+        self.tele_ids = np.zeros((0, 0), dtype=np.uint8)
+        self.tele_numbers = np.zeros((0, 0), dtype=np.uint8)
+        # TRIGGER_* mask of every cell, indexed [y, x]
+        self.triggers = np.zeros((0, 0), dtype=np.uint16)
+        # Bump whenever the grid is changed, resting tees wake up on it
+        self.revision = 0
         
-        self.teles: dict[tuple, TeleTile] = {}
-        self.dests: dict[tuple, TeleTile] = {}
-        self.cps: dict[tuple, TeleTile] = {}
+        # Non-empty tiles of each physics layer as parallel arrays
+        self.meshes: dict[str, TileArrays] = {}
+        
+        if arrays is None:
+            with open(map_path, "rb") as f:
+                data = f.read()
+            
+            digest = map_digest(data)
+            path = cache_path(map_path, digest, cache_dir)
+            
+            arrays = load_compiled(path, digest) if use_cache else None
+            if arrays is None:
+                self.map = Map.from_bytes(data)
+                arrays = self._compile()
+                if use_cache:
+                    save_compiled(path, digest, arrays)
+        
+        # Compiled form of the map, everything else is derived from it
+        self.arrays = arrays
+        self._load(arrays)
+    
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "MapLoader":
+        return cls(arrays=arrays)
         
-        self._build()
+    def _compile(self) -> dict[str, np.ndarray]:
+        arrays = {}
         
-    def _build(self):
         for group in self.map.groups:
             for layer in group.layers:
-                match layer.kind():
+                kind = layer.kind()
+                match kind:
                     case "Game":
-                        for _id, position, uvs, flags in get_tiles_mesh(layer.tiles, "Game"):
-                            tile = GameTile(
-                                id=_id,
-                                position=position,
-                                uvs=uvs,
-                                flags=flags
-                            )
-                            
-                            if (position.x, position.y) not in self.tiles:
-                                self.tiles[(position.x, position.y)] = []
-                            self.tiles[(position.x, position.y)].append(tile)
-                                                
-                            match _id:
-                                case GameTileType.UNHOOKABLE | GameTileType.HOOKABLE:
-                                    self.collidables.append(tile)
-                                case GameTileType.SPAWN | GameTileType.REDSPAWN | GameTileType.BLUESPAWN:
-                                    self.spawners.append(tile)
-                                case _:
-                                    pass
-                        
+                        flags = GAME_FLAGS[layer.tiles[:, :, 0]]
+                        triggers = GAME_TRIGGERS[layer.tiles[:, :, 0]]
                     case "Tele":
-                        for _id, position, uvs, number in get_tiles_mesh(layer.tiles, "Tele"):
-                            # print(_id, number)
-                            tile = TeleTile(
-                                id=_id,
-                                position=position,
-                                uvs=uvs,
-                                number=number
-                            )
-                            
-                            if (position.x, position.y) not in self.tiles:
-                                self.tiles[(position.x, position.y)] = []
-                            self.tiles[(position.x, position.y)].append(tile)
-                            
-                            if tile.is_teleporter():
-                                self.teles[(position.x, position.y)] = tile
-                            elif tile.is_destination():
-                                self.dests[(position.x, position.y)] = tile
-                            elif tile.is_checkpoint():
-                                self.cps[(position.x, position.y)] = tile
+                        flags = TELE_FLAGS[layer.tiles[:, :, 1]]
+                        triggers = TELE_TRIGGERS[layer.tiles[:, :, 1]]
+                        arrays["tele_numbers"] = layer.tiles[:, :, 0].copy()
+                        arrays["tele_ids"] = layer.tiles[:, :, 1].copy()
+                    case _:
+                        continue
+                
+                # Physics layers all share the same dimensions
+                arrays["grid"] = arrays["grid"] | flags if "grid" in arrays else flags
+                arrays["triggers"] = arrays["triggers"] | triggers if "triggers" in arrays else triggers
+                
+                mesh = get_tiles_arrays(layer.tiles, kind)
+                for field, values in zip(mesh._fields, mesh):
+                    arrays[f"{kind.lower()}_mesh_{field}"] = values
+        
+        # Full grids of the layers are compiled too, so a SharedMap shares them
+        if "grid" in arrays:
+            for key in ("game_ids", "game_flags", "tele_ids", "tele_numbers"):
+                arrays.setdefault(key, np.zeros_like(arrays["grid"]))
+        
+        if "game_mesh_ids" in arrays:
+            xs, ys = arrays["game_mesh_positions"][:, 0], arrays["game_mesh_positions"][:, 1]
+            arrays["game_ids"][ys, xs] = arrays["game_mesh_ids"]
+            arrays["game_flags"][ys, xs] = arrays["game_mesh_flags"]
+            arrays["spawners"] = np.flatnonzero(np.isin(arrays["game_mesh_ids"], SPAWN_IDS))
+        
+        if "tele_mesh_ids" in arrays:
+            dests = np.isin(arrays["tele_mesh_ids"], DEST_IDS)
+            arrays["dest_ids"] = arrays["tele_mesh_ids"][dests]
+            arrays["dest_numbers"] = arrays["tele_mesh_flags"][dests]
+            arrays["dest_positions"] = arrays["tele_mesh_positions"][dests] * 32.0 + 16.0
+        
+        return arrays
+    
+    def _load(self, arrays: dict[str, np.ndarray]):
+        if "grid" in arrays:
+            self.grid = arrays["grid"]
+            self.height, self.width = self.grid.shape
+            self.game_ids = arrays["game_ids"]
+            self.game_flags = arrays["game_flags"]
+            self.tele_ids = arrays["tele_ids"]
+            self.tele_numbers = arrays["tele_numbers"]
+            self.triggers = arrays["triggers"]
+        
+        for kind in ("Game", "Tele"):
+            if f"{kind.lower()}_mesh_ids" in arrays:
+                self.meshes[kind] = TileArrays(*(arrays[f"{kind.lower()}_mesh_{field}"] for field in TileArrays._fields))
+        
+        if "spawners" in arrays:
+            mesh = self.meshes["Game"]
+            for i in arrays["spawners"].tolist():
+                _id = int(mesh.ids[i])
+                x, y = mesh.positions[i].tolist()
+                self.spawners.append(GameTile(
+                    id=_id,
+                    position=Vector2(x, y),
+                    uvs=TILE_UVS[_id],
+                    flags=int(mesh.flags[i])
+                ))
+                self.spawn_points.append(Vector2(x * 32 + 16, y * 32 + 16))
+        
+        if "dest_ids" in arrays:
+            for _id, number, (x, y) in zip(arrays["dest_ids"].tolist(), arrays["dest_numbers"].tolist(), arrays["dest_positions"].tolist()):
+                index = self.cp_dests if _id == TeleTileType.CP_TELE_DEST else self.tele_dests
+                index.setdefault(number, []).append(Vector2(x, y))
+        
+        # Flat views of the grids, indexing them yields plain ints
+        self._cells = memoryview(self.grid.reshape(-1))
+        self._tele_ids = memoryview(self.tele_ids.reshape(-1))
+        self._tele_numbers = memoryview(self.tele_numbers.reshape(-1))
+        self._game_ids = memoryview(self.game_ids.reshape(-1))
+        self._game_flags = memoryview(self.game_flags.reshape(-1))
+        self._triggers = memoryview(self.triggers.reshape(-1))
+        
+    def _game_tile(self, x: int, y: int) -> GameTile:
+        cell = y * self.width + x
+        _id = self._game_ids[cell]
+        return GameTile(id=_id, position=Vector2(x, y), uvs=TILE_UVS[_id], flags=self._game_flags[cell])
+    
+    def _tele_tile(self, x: int, y: int) -> TeleTile:
+        cell = y * self.width + x
+        _id = self._tele_ids[cell]
+        return TeleTile(id=_id, position=Vector2(x, y), uvs=TILE_UVS[_id], number=self._tele_numbers[cell])
+    
+    def _tiles_at(self, x: int, y: int) -> list[Tile]:
+        tiles = []
+        cell = y * self.width + x
+        if self._game_ids[cell]:
+            tiles.append(self._game_tile(x, y))
+        if self._tele_ids[cell]:
+            tiles.append(self._tele_tile(x, y))
+        return tiles
+    
+    # Tile objects are made on demand from the grids, nothing is kept per tile
+    @property
+    def tiles(self) -> TileGrid:
+        return TileGrid([(self.game_ids, NON_EMPTY), (self.tele_ids, NON_EMPTY)], self._tiles_at)
+    
+    @property
+    def collidables(self) -> TileList:
+        # Unhookable and Hookable collidables
+        mesh = self.meshes.get("Game")
+        if mesh is None:
+            return TileList(np.zeros((0, 2), dtype=np.int64), self._game_tile)
+        return TileList(mesh.positions[SOLID_IDS[mesh.ids]], self._game_tile)
+    
+    @property
+    def teles(self) -> TileGrid:
+        return TileGrid([(self.tele_ids, TELEPORTER_IDS)], self._tele_tile)
+    
+    @property
+    def dests(self) -> TileGrid:
+        return TileGrid([(self.tele_ids, DESTINATION_IDS)], self._tele_tile)
+    
+    @property
+    def cps(self) -> TileGrid:
+        return TileGrid([(self.tele_ids, CHECKPOINT_IDS)], self._tele_tile)
                         
     def get_tile(self, x, y, layer: str = "Game") -> Tile:
         x = int(x // 32)
         y = int(y // 32)
     
-        if (x, y) in self.tiles:
-            for tile in self.tiles[(x, y)]:
-                if tile.layer == layer:
-                    return tile
+        if 0 <= x < self.width and 0 <= y < self.height:
+            cell = y * self.width + x
+            if layer == "Game" and self._game_ids[cell]:
+                return self._game_tile(x, y)
+            if layer == "Tele" and self._tele_ids[cell]:
+                return self._tele_tile(x, y)
         return Tile.EMPTY
     
-    def get_teleport_destination(self, tele_tile: TeleTile) -> Vector2 | None:
-        for dest in self.dests.values():
-            if dest.number == tele_tile.number:
-                return dest.position * 32 + Vector2(16, 16)
+    def flags_at(self, x, y) -> int:
+        x = math.floor(x) >> TILE_SHIFT
+        y = math.floor(y) >> TILE_SHIFT
+        
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._cells[y * self.width + x]
+        return 0
+    
+    def triggers_at(self, x, y) -> int:
+        # TRIGGER_* mask of the cell at x, y
+        x = math.floor(x) >> TILE_SHIFT
+        y = math.floor(y) >> TILE_SHIFT
+        
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._triggers[y * self.width + x]
+        return 0
+    
+    def is_solid(self, x, y) -> bool:
+        x = math.floor(x) >> TILE_SHIFT
+        y = math.floor(y) >> TILE_SHIFT
+        
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._cells[y * self.width + x] & TILE_SOLID != 0
+        return False
+    
+    def is_solid_cell(self, x: int, y: int) -> bool:
+        # Same as is_solid, in tile coordinates
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._cells[y * self.width + x] & TILE_SOLID != 0
+        return False
+    
+    def test_box(self, x, y, half: float) -> bool:
+        # Same as is_solid on the four corners of the box
+        x0 = math.floor(x - half) >> TILE_SHIFT
+        x1 = math.floor(x + half) >> TILE_SHIFT
+        y0 = math.floor(y - half) >> TILE_SHIFT
+        y1 = math.floor(y + half) >> TILE_SHIFT
+        
+        width = self.width
+        cells = self._cells
+        for ty in (y0, y1):
+            if 0 <= ty < self.height:
+                row = ty * width
+                if 0 <= x0 < width and cells[row + x0] & TILE_SOLID:
+                    return True
+                if 0 <= x1 < width and cells[row + x1] & TILE_SOLID:
+                    return True
+        return False
+    
+    def flags_at_points(self, xs, ys) -> np.ndarray:
+        """
+        Vectorized flags_at for arrays of world positions.
+        Points outside of the map have no flags.
+        """
+        return self._grid_at(np.floor_divide(xs, UNITS_PER_TILE), np.floor_divide(ys, UNITS_PER_TILE))
+    
+    def triggers_at_points(self, xs, ys) -> np.ndarray:
+        # Vectorized triggers_at
+        return self._grid_at(np.floor_divide(xs, UNITS_PER_TILE), np.floor_divide(ys, UNITS_PER_TILE), self.triggers)
+    
+    def test_boxes(self, xs, ys, half: float) -> np.ndarray:
+        """
+        Vectorized test_box, True where any corner of a box is solid.
+        """
+        x0 = np.floor_divide(xs - half, UNITS_PER_TILE)
+        x1 = np.floor_divide(xs + half, UNITS_PER_TILE)
+        y0 = np.floor_divide(ys - half, UNITS_PER_TILE)
+        y1 = np.floor_divide(ys + half, UNITS_PER_TILE)
+        
+        flags = self._grid_at(x0, y0) | self._grid_at(x1, y0) | self._grid_at(x0, y1) | self._grid_at(x1, y1)
+        return flags & TILE_SOLID != 0
+    
+    def flags_at_tiles(self, tx: np.ndarray, ty: np.ndarray) -> np.ndarray:
+        """
+        Vectorized flags lookup by tile coordinates.
+        """
+        return self._grid_at(tx, ty)
+    
+    def _grid_at(self, tx: np.ndarray, ty: np.ndarray, grid: np.ndarray | None = None) -> np.ndarray:
+        # Tile coordinates outside of the map read as empty cells
+        if grid is None:
+            grid = self.grid
+        inside = (tx >= 0) & (tx < self.width) & (ty >= 0) & (ty < self.height)
+        index = np.where(inside, ty * self.width + tx, 0).astype(np.intp)
+        return grid.reshape(-1).take(index) * inside
+    
+    def cell_index(self, x, y) -> int:
+        return (math.floor(y) >> TILE_SHIFT) * self.width + (math.floor(x) >> TILE_SHIFT)
+    
+    def tele_at(self, x, y) -> tuple[int, int]:
+        """
+        Returns the (id, number) of the Tele layer at x, y, (0, 0) when empty.
+        """
+        x = math.floor(x) >> TILE_SHIFT
+        y = math.floor(y) >> TILE_SHIFT
+        
+        if 0 <= x < self.width and 0 <= y < self.height:
+            cell = y * self.width + x
+            return self._tele_ids[cell], self._tele_numbers[cell]
+        return 0, 0
+    
+    def get_teleport_destination(self, number: int, seed: int = 0) -> Vector2 | None:
+        """
+        DDNet picks a random destination when a number has several, `seed`
+        picks one deterministically instead. The returned vector is shared,
+        copy it before modifying.
+        """
+        dests = self.tele_dests.get(number)
+        if dests:
+            return dests[seed % len(dests)]
+        return None
+    
+    def get_checkpoint_destination(self, number: int, seed: int = 0) -> Vector2 | None:
+        dests = self.cp_dests.get(number)
+        if dests:
+            return dests[seed % len(dests)]
+        return None
+    
+    def get_spawn(self, seed: int = 0) -> Vector2 | None:
+        # Picked by seed like the destinations, shared as well
+        if self.spawn_points:
+            return self.spawn_points[seed % len(self.spawn_points)]
         return None
\ No newline at end of file
@@ -0,0 +1,56 @@
+import numpy as np
+
+from engine.engine import DDNetPhysicsEngine
+from engine.maploader import MapLoader
+from engine.tee import Tee
+
+class DeadReckoning:
+    """
+    Client side prediction of remote tees from sparse, late snapshots.
+
+    The remote inputs are unknown, so each tee keeps simulating with the
+    inputs of the last snapshot it got. `step()` advances one tick. When a
+    snapshot of an older tick arrives, `receive()` measures how far off the
+    prediction for that tick was, restores the snapshot and re-simulates
+    back up to the current tick.
+
+    Snapshots are engine.snapshot() arrays of the state after `tick` ticks.
+    """
+    def __init__(self, map: MapLoader, count: int, history: int = 64, **engine_options):
+        self.engine = DDNetPhysicsEngine(map, [Tee() for _ in range(count)], history=history, **engine_options)
+        self.last_snapshot = -1
+
+    @property
+    def tick(self) -> int:
+        return self.engine.tick_count
+
+    @property
+    def tees(self) -> list[Tee]:
+        return self.engine.players
+
+    def step(self):
+        self.engine.tick(1/50)
+
+    def receive(self, tick: int, snapshot: np.ndarray) -> float | None:
+        """
+        Reconciles with the authoritative state after `tick` ticks. Returns
+        the largest position error of the prediction for that tick, None
+        when there was none to compare (first or too old a snapshot).
+        """
+        if tick <= self.last_snapshot:
+            return None
+        self.last_snapshot = tick
+
+        engine = self.engine
+        now = engine.tick_count
+        error = None
+        if tick < now and engine.history.has(tick):
+            predicted = engine.history.states[tick % engine.history.capacity]
+            error = float(np.max(np.hypot(*(predicted["position"] - snapshot["position"]).T)))
+
+        engine.restore(snapshot)
+        engine.tick_count = tick
+        # Caught up again with the inputs of the snapshot
+        for _ in range(now - tick):
+            engine.tick(1/50)
+        return error
@@ -0,0 +1,288 @@
+"""
+Optional instrumentation of a DDNetPhysicsEngine.
+
+    profiler = Profiler()
+    profiler.attach(engine)
+    ...
+    profiler.detach()
+    profiler.write_chrome_trace("ticks.json")
+
+Attaching wraps the engine's phases, its tees' methods and its map with
+timed and counting versions as instance attributes, detaching removes
+them again, so an engine without a profiler runs exactly the code it
+always does. Every tick records the wall time of each engine phase, the
+map lookups the engine makes itself, and per tee the time of each of its
+steps, map lookups by method, stepping resolver substeps and hook
+raycasts with their total length. Lookups are counted in grid cells read,
+test_box reads four.
+"""
+import json
+import time
+from collections import deque
+from typing import NamedTuple
+
+from engine.maploader import MapLoader
+
+ENGINE_PHASES = ("tick_players", "interact_players", "move_players", "post_tick_players")
+TEE_STEPS = ("tick", "interact", "move", "post_tick")
+
+# Map queries counted, all of them read cells of the grid
+LOOKUPS = ("get_tile", "flags_at", "is_solid", "is_solid_cell", "test_box", "tele_at", "triggers_at", "cell_index")
+# Cells read by one query, the corners of the box for test_box
+CELLS = {"test_box": 4}
+
+class TeeProfile:
+    __slots__ = ("seconds", "lookups", "substeps", "hook_rays", "hook_length", "hook_seconds")
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(TEE_STEPS, 0.0)
+        self.lookups = dict.fromkeys(LOOKUPS, 0)
+        self.substeps = 0
+        self.hook_rays = 0
+        self.hook_length = 0.0
+        self.hook_seconds = 0.0
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class TickProfile(NamedTuple):
+    tick: int
+    start: float    # seconds since the profiler was made
+    seconds: float
+    phases: dict[str, float]
+    lookups: dict[str, int]    # made by the engine, like sleeping checks
+    tees: list[TeeProfile]
+
+    def to_dict(self) -> dict:
+        return {
+            "tick": self.tick,
+            "start": self.start,
+            "seconds": self.seconds,
+            "phases": self.phases,
+            "lookups": self.lookups,
+            "tees": [tee.to_dict() for tee in self.tees],
+        }
+
+class CountingMap:
+    """
+    Stands in for the engine's map, counting lookups into `counts`, which
+    the profiler points at the profile of the tee being simulated or the
+    engine's own. While `moving` is set, also counts the substeps that
+    Tee._move_box runs into it.
+    """
+    def __init__(self, map: MapLoader):
+        self.map = map
+        self.counts = dict.fromkeys(LOOKUPS, 0)
+        self.moving: TeeProfile | None = None
+        self._followups = 0
+
+    def __getattr__(self, name):
+        return getattr(self.map, name)
+
+    def test_box(self, x, y, half):
+        self.counts["test_box"] += CELLS["test_box"]
+        hit = self.map.test_box(x, y, half)
+        if self.moving is not None:
+            # Every substep tests the next position, then both axes on a hit
+            if self._followups:
+                self._followups -= 1
+            else:
+                self.moving.substeps += 1
+                if hit:
+                    self._followups = 2
+        return hit
+
+def _counted(name: str):
+    def lookup(self, *args):
+        self.counts[name] += 1
+        return getattr(self.map, name)(*args)
+    lookup.__name__ = name
+    return lookup
+
+for _name in LOOKUPS:
+    if _name not in CELLS:
+        setattr(CountingMap, _name, _counted(_name))
+
+class Profiler:
+    def __init__(self, keep: int | None = None):
+        # Only the last `keep` ticks are kept when given
+        self.ticks: deque[TickProfile] = deque(maxlen=keep)
+        self.engine = None
+        self.origin = time.perf_counter()
+
+        self._map = None
+        self._tees = []
+        self._current: list[TeeProfile] = []
+        self._phases: dict[str, float] = {}
+        self._lookups: dict[str, int] = {}
+
+    def attach(self, engine):
+        if self.engine is not None:
+            raise ValueError("Profiler is already attached")
+        self.engine = engine
+        self._map = CountingMap(engine.map)
+        engine.map = self._map
+
+        engine.tick = self._wrap_tick(engine.tick)
+        for name in ENGINE_PHASES:
+            setattr(engine, name, self._wrap_phase(name, getattr(engine, name)))
+
+    def detach(self):
+        engine = self.engine
+        if engine is None:
+            return
+        for name in ("tick",) + ENGINE_PHASES:
+            engine.__dict__.pop(name, None)
+        engine.map = self._map.map
+        for tee in self._tees:
+            for name in TEE_STEPS + ("_move_box", "_intersect_line_hook"):
+                tee.__dict__.pop(name, None)
+        self._tees = []
+        self.engine = None
+
+    def _wrap_tick(self, tick):
+        def profiled_tick(dt):
+            engine = self.engine
+            if len(self._tees) != len(engine.players) or any(a is not b for a, b in zip(self._tees, engine.players)):
+                self._wrap_tees(engine.players)
+
+            self._current = [TeeProfile() for _ in engine.players]
+            self._phases = dict.fromkeys(ENGINE_PHASES, 0.0)
+            self._lookups = dict.fromkeys(LOOKUPS, 0)
+            self._map.counts = self._lookups
+            number = engine.tick_count
+            start = time.perf_counter()
+            tick(dt)
+            end = time.perf_counter()
+            self.ticks.append(TickProfile(number, start - self.origin, end - start, self._phases, self._lookups, self._current))
+        return profiled_tick
+
+    def _wrap_phase(self, name: str, phase):
+        def profiled_phase(*args):
+            start = time.perf_counter()
+            phase(*args)
+            self._phases[name] += time.perf_counter() - start
+        return profiled_phase
+
+    def _wrap_tees(self, tees: list):
+        for tee in self._tees:
+            for name in TEE_STEPS + ("_move_box", "_intersect_line_hook"):
+                tee.__dict__.pop(name, None)
+        self._tees = list(tees)
+
+        for i, tee in enumerate(tees):
+            for name in TEE_STEPS:
+                setattr(tee, name, self._wrap_step(i, name, getattr(tee, name)))
+            tee._move_box = self._wrap_move_box(i, tee._move_box)
+            tee._intersect_line_hook = self._wrap_hook(i, tee._intersect_line_hook)
+
+    def _wrap_step(self, index: int, name: str, step):
+        def profiled_step(*args):
+            profile = self._current[index]
+            self._map.counts = profile.lookups
+            start = time.perf_counter()
+            step(*args)
+            profile.seconds[name] += time.perf_counter() - start
+            # Anything between tee steps is the engine's
+            self._map.counts = self._lookups
+        return profiled_step
+
+    def _wrap_move_box(self, index: int, move_box):
+        def profiled_move_box(pos, vel, map):
+            counting = self._map
+            counting.moving = self._current[index]
+            counting._followups = 0
+            try:
+                return move_box(pos, vel, map)
+            finally:
+                counting.moving = None
+        return profiled_move_box
+
+    def _wrap_hook(self, index: int, intersect):
+        def profiled_hook(pos0, pos1, map):
+            profile = self._current[index]
+            profile.hook_rays += 1
+            profile.hook_length += pos0.distance(pos1)
+            start = time.perf_counter()
+            result = intersect(pos0, pos1, map)
+            profile.hook_seconds += time.perf_counter() - start
+            return result
+        return profiled_hook
+
+    def summary(self) -> dict:
+        """
+        Totals over the recorded ticks.
+        """
+        ticks = len(self.ticks)
+        phases = dict.fromkeys(ENGINE_PHASES, 0.0)
+        lookups = dict.fromkeys(LOOKUPS, 0)
+        engine_lookups = dict.fromkeys(LOOKUPS, 0)
+        substeps = hook_rays = 0
+        hook_length = seconds = 0.0
+        for record in self.ticks:
+            seconds += record.seconds
+            for name, value in record.phases.items():
+                phases[name] += value
+            for name, value in record.lookups.items():
+                engine_lookups[name] += value
+                lookups[name] += value
+            for tee in record.tees:
+                for name, value in tee.lookups.items():
+                    lookups[name] += value
+                substeps += tee.substeps
+                hook_rays += tee.hook_rays
+                hook_length += tee.hook_length
+        return {
+            "ticks": ticks,
+            "seconds": seconds,
+            "slowest_tick": max((record.seconds for record in self.ticks), default=0.0),
+            "phases": phases,
+            "lookups": lookups,
+            "engine_lookups": engine_lookups,
+            "substeps": substeps,
+            "hook_rays": hook_rays,
+            "hook_length": hook_length,
+        }
+
+    def write_jsonl(self, path: str):
+        # One JSON object per tick
+        with open(path, "w") as f:
+            for record in self.ticks:
+                f.write(json.dumps(record.to_dict()) + "\n")
+
+    def write_chrome_trace(self, path: str):
+        """
+        Chrome trace event file (chrome://tracing, Perfetto). Engine phases
+        are on thread 0, tee i on thread i + 1 with its steps laid out one
+        after the other inside their phases and its counters as arguments.
+        """
+        events = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": "engine"}}]
+        for record in self.ticks:
+            us = record.start * 1e6
+            events.append({
+                "name": f"tick {record.tick}", "ph": "X", "pid": 0, "tid": 0, "ts": us, "dur": record.seconds * 1e6,
+                "args": {"lookups": sum(record.lookups.values())}
+            })
+
+            phase_start = us
+            offsets = []
+            for name in ENGINE_PHASES:
+                duration = record.phases[name] * 1e6
+                events.append({"name": name, "ph": "X", "pid": 0, "tid": 0, "ts": phase_start, "dur": duration})
+                offsets.append(phase_start)
+                phase_start += duration
+
+            for i, tee in enumerate(record.tees):
+                args = {
+                    "lookups": sum(tee.lookups.values()),
+                    "substeps": tee.substeps,
+                    "hook_rays": tee.hook_rays,
+                    "hook_length": tee.hook_length,
+                }
+                for step, start in zip(TEE_STEPS, offsets):
+                    duration = tee.seconds[step] * 1e6
+                    if duration:
+                        events.append({"name": step, "ph": "X", "pid": 0, "tid": i + 1, "ts": start, "dur": duration, "args": args})
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
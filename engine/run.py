@@ -0,0 +1,187 @@
+"""
+Headless simulation, no window and no waiting on the clock.
+
+    python -m engine.run maps/Volleyball_v2.map --tees 8 --ticks 5000 --policy random
+    python -m engine.run maps/Volleyball_v2.map --inputs bot.py --json
+    python -m engine.run maps/Volleyball_v2.map --policy random --record run.pdil
+    python -m engine.run maps/Volleyball_v2.map --tees 64 --profile trace.json
+
+`--inputs` takes a Python file defining `inputs(tick, tees)`, called before
+every tick to set the inputs of the tees. `--record` writes the inputs
+as an engine.inputlog file to replay later. `--profile` writes a Chrome
+trace of every tick (engine.profiler), or JSON lines when the path ends
+in .jsonl. Only the engine is imported,
+arcade and pyglet stay unloaded.
+"""
+import argparse
+import json
+import os
+import random
+import runpy
+import time
+from typing import Callable, NamedTuple
+
+from engine.collision import RESOLVERS
+from engine.engine import DDNetPhysicsEngine
+from engine.inputlog import InputRecorder
+from engine.maploader import MapLoader
+from engine.profiler import Profiler
+from engine.tee import Tee
+from shared import Vector2
+
+TICK_TIME = 1/50
+
+InputCallback = Callable[[int, list[Tee]], None]
+
+class RunResult(NamedTuple):
+    ticks: int
+    seconds: float
+    tees: list[Tee]
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.seconds if self.seconds > 0 else float("inf")
+
+def spawn_tees(map: MapLoader, count: int, seed: int | None = None) -> list[Tee]:
+    # Round robin over the spawns, shuffled when a seed is given
+    spawners = list(map.spawners)
+    if not spawners:
+        raise ValueError("Map has no spawn tiles")
+    if seed is not None:
+        random.Random(seed).shuffle(spawners)
+
+    tees = []
+    for i in range(count):
+        tee = Tee()
+        tee.position = spawners[i % len(spawners)].position * 32 + Vector2(16, 16)
+        tees.append(tee)
+    return tees
+
+def idle_inputs(tick: int, tees: list[Tee]):
+    pass
+
+def random_inputs(seed: int = 0) -> InputCallback:
+    rng = random.Random(seed)
+    def inputs(tick: int, tees: list[Tee]):
+        for tee in tees:
+            if rng.random() < 0.05:
+                tee.direction = rng.choice((-1, 0, 1))
+            if rng.random() < 0.05:
+                tee.should_jump = not tee.should_jump
+            if rng.random() < 0.04:
+                tee.should_hook = not tee.should_hook
+            if rng.random() < 0.05:
+                tee.target.set(rng.uniform(-300, 300), rng.uniform(-300, 300))
+    return inputs
+
+def load_inputs(path: str) -> InputCallback:
+    namespace = runpy.run_path(path)
+    if not callable(namespace.get("inputs")):
+        raise ValueError(f"{path} does not define inputs(tick, tees)")
+    return namespace["inputs"]
+
+def simulate(engine: DDNetPhysicsEngine, ticks: int, inputs: InputCallback = idle_inputs) -> RunResult:
+    """
+    Steps the engine `ticks` times as fast as possible, calling
+    `inputs(tick, tees)` before each tick.
+    """
+    players = engine.players
+    start = time.perf_counter()
+    for tick in range(ticks):
+        inputs(tick, players)
+        engine.tick(TICK_TIME)
+    return RunResult(ticks, time.perf_counter() - start, players)
+
+def run(
+    map_path: str,
+    tees: int = 1,
+    ticks: int = 50 * 60,
+    inputs: InputCallback = idle_inputs,
+    seed: int | None = None,
+    record: str | None = None,
+    profiler: Profiler | None = None,
+    **engine_options
+) -> RunResult:
+    map = MapLoader(map_path)
+    engine = DDNetPhysicsEngine(map, spawn_tees(map, tees, seed), **engine_options)
+    if profiler is not None:
+        profiler.attach(engine)
+    if record is None:
+        return simulate(engine, ticks, inputs)
+
+    with InputRecorder.open(record, engine, os.path.basename(map_path)) as recorder:
+        engine.recorder = recorder
+        return simulate(engine, ticks, inputs)
+
+def tee_state(tee: Tee) -> dict:
+    return {
+        "position": [tee.position.x, tee.position.y],
+        "velocity": [tee.velocity.x, tee.velocity.y],
+        "hook_state": int(tee.hook_state),
+        "hookpos": [tee.hookpos.x, tee.hookpos.y],
+        "hooked_player": tee.hooked_player,
+        "jumped": tee.jumped,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("map")
+    parser.add_argument("--tees", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=50 * 60)
+    parser.add_argument("--policy", choices=("idle", "random"), default="idle", help="built in inputs")
+    parser.add_argument("--inputs", help="Python file defining inputs(tick, tees)")
+    parser.add_argument("--seed", type=int, default=None, help="shuffles spawns and seeds the random policy")
+    parser.add_argument("--resolver", choices=RESOLVERS, default="stepped")
+    parser.add_argument("--no-player-collision", action="store_true")
+    parser.add_argument("--no-player-hooking", action="store_true")
+    parser.add_argument("--no-sleeping", action="store_true", help="simulate tees at rest every tick")
+    parser.add_argument("--record", help="write the inputs to this input log")
+    parser.add_argument("--profile", help="write a Chrome trace (or .jsonl stream) of every tick")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    if args.inputs:
+        inputs = load_inputs(args.inputs)
+    elif args.policy == "random":
+        inputs = random_inputs(args.seed or 0)
+    else:
+        inputs = idle_inputs
+
+    profiler = Profiler() if args.profile else None
+    result = run(
+        args.map,
+        tees=args.tees,
+        ticks=args.ticks,
+        inputs=inputs,
+        seed=args.seed,
+        record=args.record,
+        profiler=profiler,
+        resolver=args.resolver,
+        player_collision=not args.no_player_collision,
+        player_hooking=not args.no_player_hooking,
+        sleeping=not args.no_sleeping,
+    )
+
+    if profiler is not None:
+        profiler.detach()
+        if args.profile.endswith(".jsonl"):
+            profiler.write_jsonl(args.profile)
+        else:
+            profiler.write_chrome_trace(args.profile)
+
+    if args.json:
+        print(json.dumps({
+            "ticks": result.ticks,
+            "seconds": result.seconds,
+            "ticks_per_second": result.ticks_per_second,
+            "tees": [tee_state(tee) for tee in result.tees],
+        }, indent=2))
+        return
+
+    print(f"{result.ticks} ticks in {result.seconds:.3f}s, {result.ticks_per_second:.1f} ticks/s")
+    for i, tee in enumerate(result.tees):
+        print(f"tee {i}: x {tee.position.x / 32:.2f} y {tee.position.y / 32:.2f}"
+              f"  vx {tee.velocity.x / 32:.2f} vy {tee.velocity.y / 32:.2f}  hook {tee.hook_state.name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+from engine.maploader import MapLoader
+
+# Keeps every array cache line aligned inside the block
+ALIGNMENT = 64
+
+class SharedMap:
+    """
+    A compiled map stored in one shared memory block.
+
+    The owning process calls `SharedMap.create(...)` once and hands `spec`
+    to its workers (it pickles), which call `SharedMap.attach(spec)`. Every
+    attached `map` is a read-only MapLoader viewing the same memory, so
+    workers share a single copy of the grids and meshes.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict[str, tuple], owner: bool):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+
+        arrays = {}
+        for key, (offset, shape, dtype) in layout.items():
+            array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            array.flags.writeable = False
+            arrays[key] = array
+
+        self.map = MapLoader.from_arrays(arrays)
+
+    @classmethod
+    def create(cls, map: MapLoader | str) -> "SharedMap":
+        if isinstance(map, str):
+            map = MapLoader(map)
+
+        layout = {}
+        size = 0
+        for key, array in map.arrays.items():
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout[key] = (size, array.shape, array.dtype.str)
+            size += array.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for key, array in map.arrays.items():
+            offset, shape, dtype = layout[key]
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = array
+
+        return cls(shm, layout, owner=True)
+
+    @classmethod
+    def attach(cls, spec: tuple[str, dict[str, tuple]]) -> "SharedMap":
+        name, layout = spec
+        # The owner unlinks the block, workers must not clean it up on exit
+        shm = shared_memory.SharedMemory(name=name, track=False)
+        return cls(shm, layout, owner=False)
+
+    @property
+    def spec(self) -> tuple[str, dict[str, tuple]]:
+        return self.shm.name, self.layout
+
+    def close(self):
+        # Views into the block have to go before it can be closed
+        self.map = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
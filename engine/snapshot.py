@@ -0,0 +1,123 @@
+import struct
+import numpy as np
+
+from engine.tee import Tee
+from shared import HookState
+
+# Every piece of Tee state in buffer order, as struct codes. "vec" is a Vector2.
+TEE_FIELDS = (
+    ("position", "vec"),
+    ("velocity", "vec"),
+    ("jumps", "q"),
+    ("jumped", "q"),
+    ("should_jump", "?"),
+    ("jump_count", "q"),
+    ("direction", "q"),
+    ("should_hook", "?"),
+    ("angle", "d"),
+    ("target", "vec"),
+    ("newhook", "?"),
+    ("hookpos", "vec"),
+    ("hookdir", "vec"),
+    ("hooktick", "d"),
+    ("hook_state", "q"),
+    ("hook_telebase", "vec"),
+    ("target_direction", "vec"),
+    ("reset", "?"),
+    ("hooked_player", "q"),
+    ("freeze_time", "q"),
+    ("deep_frozen", "?"),
+    ("tele_checkpoint", "q"),
+)
+
+# Packed record of one tee, readable as a struct or as a NumPy record
+TEE_STATE = struct.Struct("<" + "".join("2d" if kind == "vec" else kind for _, kind in TEE_FIELDS))
+TEE_DTYPE = np.dtype([(name, "<f8", (2,)) if kind == "vec" else (name, np.dtype(kind).newbyteorder("<")) for name, kind in TEE_FIELDS])
+assert TEE_STATE.size == TEE_DTYPE.itemsize
+
+def pack_tee(buffer, offset: int, tee: Tee):
+    TEE_STATE.pack_into(
+        buffer, offset,
+        tee.position.x, tee.position.y,
+        tee.velocity.x, tee.velocity.y,
+        tee.jumps, tee.jumped, tee.should_jump, tee.jump_count,
+        tee.direction, tee.should_hook, tee.angle,
+        tee.target.x, tee.target.y,
+        tee.newhook,
+        tee.hookpos.x, tee.hookpos.y,
+        tee.hookdir.x, tee.hookdir.y,
+        tee.hooktick, tee.hook_state,
+        tee.hook_telebase.x, tee.hook_telebase.y,
+        tee.target_direction.x, tee.target_direction.y,
+        tee.reset, tee.hooked_player,
+        tee.freeze_time, tee.deep_frozen, tee.tele_checkpoint
+    )
+
+def unpack_tee(buffer, offset: int, tee: Tee):
+    # Vectors are written in place, the tee keeps its objects
+    (
+        px, py, vx, vy,
+        tee.jumps, tee.jumped, tee.should_jump, tee.jump_count,
+        tee.direction, tee.should_hook, tee.angle,
+        tx, ty,
+        tee.newhook,
+        hx, hy, dx, dy,
+        tee.hooktick, hook_state,
+        bx, by, ax, ay,
+        tee.reset, tee.hooked_player,
+        tee.freeze_time, tee.deep_frozen, tee.tele_checkpoint
+    ) = TEE_STATE.unpack_from(buffer, offset)
+    tee.position.set(px, py)
+    tee.velocity.set(vx, vy)
+    tee.target.set(tx, ty)
+    tee.hookpos.set(hx, hy)
+    tee.hookdir.set(dx, dy)
+    tee.hook_telebase.set(bx, by)
+    tee.target_direction.set(ax, ay)
+    tee.hook_state = HookState(hook_state)
+
+def pack_tees(tees: list[Tee], out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Packs the tees into a (len(tees),) TEE_DTYPE array, reusing out if given.
+    """
+    if out is None:
+        out = np.zeros(len(tees), dtype=TEE_DTYPE)
+    raw = out.view(np.uint8)
+    for i, tee in enumerate(tees):
+        pack_tee(raw, i * TEE_STATE.size, tee)
+    return out
+
+def unpack_tees(snapshot: np.ndarray, tees: list[Tee]):
+    raw = snapshot.view(np.uint8)
+    for i, tee in enumerate(tees):
+        unpack_tee(raw, i * TEE_STATE.size, tee)
+
+class SnapshotRing:
+    """
+    Preallocated snapshots of the last `capacity` ticks of a fixed set of
+    tees. Slot tick % capacity holds the state at the start of that tick.
+    """
+    def __init__(self, capacity: int, tees: int):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, tees), dtype=TEE_DTYPE)
+        self.ticks = np.full(capacity, -1, dtype=np.int64)
+        # Byte view of each slot, made once so saving allocates nothing
+        self._slots = [self.states[i].view(np.uint8) for i in range(capacity)]
+
+    def save(self, tick: int, tees: list[Tee]):
+        slot = tick % self.capacity
+        raw = self._slots[slot]
+        for i, tee in enumerate(tees):
+            pack_tee(raw, i * TEE_STATE.size, tee)
+        self.ticks[slot] = tick
+
+    def has(self, tick: int) -> bool:
+        return tick >= 0 and self.ticks[tick % self.capacity] == tick
+
+    def load(self, tick: int, tees: list[Tee]):
+        if not self.has(tick):
+            raise KeyError(f"Tick {tick} is not in the snapshot ring")
+        slot = tick % self.capacity
+        raw = self._slots[slot]
+        for i, tee in enumerate(tees):
+            unpack_tee(raw, i * TEE_STATE.size, tee)
@@ -1,6 +1,8 @@
 import math
 import numpy as np
 
+from engine.broadphase import SpatialHash
+from engine.collision import closest_point_on_line, intersect_line_hook, move_box_swept
 from engine.maploader import MapLoader
 from shared import *
 
@@ -49,16 +51,45 @@ class Tee:
         self.hooktick = 0
         self.hook_state = HookState.RETRACTED
         self.hook_telebase = Vector2(0, 0)
+        # Index of the hooked tee in the engine's players, -1 for none
+        self.hooked_player = -1
         
         self.target_direction = Vector2(0, 0)
         
         self.reset = False
         
-    def tick(self, dt, map: MapLoader):
-        grounded = map.get_tile(self.position.x + HITBOX_SIZE / 2, self.position.y + HITBOX_SIZE / 2 + 5).is_solid() or \
-                   map.get_tile(self.position.x - HITBOX_SIZE / 2, self.position.y + HITBOX_SIZE / 2 + 5).is_solid()
+        # Ticks left frozen, deep frozen tees are refrozen every tick
+        self.freeze_time = 0
+        self.deep_frozen = False
+        # Number of the last checkpoint, where checkpoint teles lead
+        self.tele_checkpoint = 0
+        # Teleports and deaths so far, renderers don't smooth over them
+        self.teleports = 0
+        
+        # Scratch vectors reused every tick instead of allocating
+        self._newpos = Vector2(0, 0)
+        self._hookvel = Vector2(0, 0)
+        self._hit = Vector2(0, 0)
+        self._oldpos = Vector2(0, 0)
+        
+    def tick(self, dt, map: MapLoader, players: SpatialHash | None = None):
+        if self.deep_frozen:
+            self.freeze_time = FREEZE_TICKS
+            
+        # Frozen tees can't walk, jump or hook, their inputs stay as they are
+        direction = self.direction
+        should_jump = self.should_jump
+        should_hook = self.should_hook
+        if self.freeze_time > 0:
+            self.freeze_time -= 1
+            direction = 0
+            should_jump = False
+            should_hook = False
+            
+        grounded = map.is_solid(self.position.x + HITBOX_SIZE / 2, self.position.y + HITBOX_SIZE / 2 + 5) or \
+                   map.is_solid(self.position.x - HITBOX_SIZE / 2, self.position.y + HITBOX_SIZE / 2 + 5)
                    
-        self.target_direction = self.target.normal()
+        self.target_direction.set(self.target.x, self.target.y).normalize()
                    
         # print(grounded, self.position / 32)
         
@@ -74,7 +105,7 @@ class Tee:
         else:
             self.angle = int(tmpangle * 256)
         
-        if self.should_jump:
+        if should_jump:
             if not (self.jumped & 1):
                 if grounded and (not (self.jumped & 2) or self.jumps != 0):
                     self.velocity.y = -GROUND_JUMP_IMPULSE
@@ -90,31 +121,36 @@ class Tee:
         else:
             self.jumped &= ~1
             
-        if self.should_hook:
+        if should_hook:
             if self.hook_state == HookState.IDLE:
                 self.hook_state = HookState.FLYING
-                self.hookpos = self.position + self.target_direction * 28 * 1.5
-                self.hookdir = self.target_direction * 1
+                self.hookpos.set(
+                    self.position.x + self.target_direction.x * 28 * 1.5,
+                    self.position.y + self.target_direction.y * 28 * 1.5
+                )
+                self.hookdir.set(self.target_direction.x, self.target_direction.y)
+                self.hooked_player = -1
                 
                 self.hooktick = 50 * (1.25 - HOOK_DURATION)
         else:
             self.hook_state = HookState.IDLE
-            self.hookpos = self.position * 1
+            self.hooked_player = -1
+            self.hookpos.set(self.position.x, self.position.y)
         
         if grounded:
             self.jumped &= ~2
             self.jump_count = 0
             
-        if self.direction < 0:
+        if direction < 0:
             self.velocity.x = saturated_add(-MAXSPEED, MAXSPEED, self.velocity.x, -ACCELERATION)
-        if self.direction > 0:
+        if direction > 0:
             self.velocity.x = saturated_add(-MAXSPEED, MAXSPEED, self.velocity.x, ACCELERATION)
-        if self.direction == 0:
+        if direction == 0:
             self.velocity.x *= FRICTION
             
         match self.hook_state:
             case HookState.IDLE | HookState.RETRACTED:
-                self.hookpos = self.position * 1
+                self.hookpos.set(self.position.x, self.position.y)
             case HookState.RETRACT_START:
                 self.hook_state = HookState.RETRACT_MIDDLE
             case HookState.RETRACT_MIDDLE:
@@ -122,15 +158,21 @@ class Tee:
             case HookState.RETRACT_END:
                 self.hook_state = HookState.RETRACTED
             case HookState.FLYING:
-                hookbase = self.position * 1
+                hookbase = self.position
                 
                 # if self.newhook:
                 #     hookbase = self.hooktelebase
                     
-                newpos = self.hookpos + self.hookdir * HOOK_FIRE_SPEED
+                newpos = self._newpos.set(
+                    self.hookpos.x + self.hookdir.x * HOOK_FIRE_SPEED,
+                    self.hookpos.y + self.hookdir.y * HOOK_FIRE_SPEED
+                )
                 if hookbase.distance(newpos) > HOOK_LENGTH:
                     self.hook_state = HookState.RETRACT_START
-                    newpos = hookbase + (newpos - hookbase).normal() * HOOK_LENGTH
+                    newpos -= hookbase
+                    newpos.normalize()
+                    newpos *= HOOK_LENGTH
+                    newpos += hookbase
                     self.reset = True
                     
                 going_to_hit_ground = False
@@ -145,47 +187,142 @@ class Tee:
                     going_to_retract = True
                     self.reset = True
                     
+                # Tees on the way take the hook before the ground does
+                if players is not None and (self.hook_state == HookState.FLYING or not self.newhook):
+                    distance = 0.0
+                    for i in players.query(self.hookpos.x, self.hookpos.y, newpos.x, newpos.y, HITBOX_SIZE + 2.0):
+                        other = players.tees[i]
+                        if other is self:
+                            continue
+                        closest = closest_point_on_line(self.hookpos.x, self.hookpos.y, newpos.x, newpos.y, other.position.x, other.position.y)
+                        if closest is None:
+                            continue
+                        dx = other.position.x - closest[0]
+                        dy = other.position.y - closest[1]
+                        if math.sqrt(dx * dx + dy * dy) < HITBOX_SIZE + 2.0:
+                            if self.hooked_player == -1 or self.hookpos.distance(other.position) < distance:
+                                going_to_hit_ground = False
+                                going_to_retract = False
+                                self.hook_state = HookState.GRABBED
+                                self.hooked_player = i
+                                distance = self.hookpos.distance(other.position)
+                    
                 if self.hook_state == HookState.FLYING:
                     if going_to_hit_ground:
                         self.hook_state = HookState.GRABBED
                     if going_to_retract:
                         self.hook_state = HookState.RETRACT_START
                         
-                    self.hookpos = newpos
+                    self.hookpos.set(newpos.x, newpos.y)
                     
         if self.hook_state == HookState.GRABBED:
-            if self.hookpos.distance(self.position) > 46:
-                hookvel = (self.hookpos - self.position).normal() * HOOK_DRAG_ACCEL
+            if self.hooked_player != -1:
+                if players is not None and self.hooked_player < len(players.tees):
+                    hooked = players.tees[self.hooked_player].position
+                    self.hookpos.set(hooked.x, hooked.y)
+                else:
+                    self._release_hook()
+                    
+            # Hooked tees are dragged in interact instead
+            if self.hooked_player == -1 and self.hookpos.distance(self.position) > 46:
+                hookvel = self._hookvel.set(self.hookpos.x - self.position.x, self.hookpos.y - self.position.y)
+                hookvel.normalize()
+                hookvel *= HOOK_DRAG_ACCEL
                 
                 if hookvel.y > 0:
                     hookvel.y *= 0.3
                     
-                if (hookvel.x < 0 and self.direction < 0) or (hookvel.x > 0 and self.direction > 0):
+                if (hookvel.x < 0 and direction < 0) or (hookvel.x > 0 and direction > 0):
                     hookvel.x *= 0.95
                 else:
                     hookvel.x *= 0.75
                     
-                newvel = self.velocity + hookvel
-                newvellen = newvel.length()
+                newvel_x = self.velocity.x + hookvel.x
+                newvel_y = self.velocity.y + hookvel.y
+                newvellen = math.sqrt(newvel_x * newvel_x + newvel_y * newvel_y)
                 
                 if newvellen < HOOK_DRAG_SPEED or newvellen < self.velocity.length():
-                    self.velocity = newvel
+                    self.velocity.set(newvel_x, newvel_y)
                     
             self.hooktick += 1
+            if self.hooked_player != -1 and self.hooktick > 50 * HOOK_DURATION:
+                self._release_hook()
             
 
+        self._clamp_velocity()
+        
+    def interact(self, players: SpatialHash, collision: bool = True, hooking: bool = True):
+        """
+        DDNet's deferred tick, run once every tee has ticked: tees too close
+        push each other apart and a hooked tee is dragged towards us.
+        """
+        candidates = players.query(self.position.x, self.position.y, self.position.x, self.position.y, HITBOX_SIZE * 1.25) if collision else []
+        if hooking and self.hooked_player != -1 and self.hooked_player not in candidates:
+            candidates.append(self.hooked_player)
+            candidates.sort()
+            
+        for i in candidates:
+            other = players.tees[i]
+            if other is self:
+                continue
+            
+            distance = self.position.distance(other.position)
+            if distance <= 0:
+                continue
+            
+            dir_x = (self.position.x - other.position.x) / distance
+            dir_y = (self.position.y - other.position.y) / distance
+            
+            if collision and distance < HITBOX_SIZE * 1.25:
+                a = HITBOX_SIZE * 1.45 - distance
+                velocity = 0.5
+                # Don't add excess force when already moving away
+                length = self.velocity.length()
+                if length > 0.0001:
+                    velocity = 1 - ((self.velocity.x / length) * dir_x + (self.velocity.y / length) * dir_y + 1) / 2
+                self.velocity.x += dir_x * a * (velocity * 0.75)
+                self.velocity.y += dir_y * a * (velocity * 0.75)
+                self.velocity *= 0.85
+                
+            if hooking and self.hooked_player == i and distance > HITBOX_SIZE * 1.5:
+                accel = HOOK_DRAG_ACCEL * (distance / HOOK_LENGTH)
+                # Pull the hooked tee, and us a little towards it
+                other.velocity.set(
+                    saturated_add(-HOOK_DRAG_SPEED, HOOK_DRAG_SPEED, other.velocity.x, accel * dir_x * 1.5),
+                    saturated_add(-HOOK_DRAG_SPEED, HOOK_DRAG_SPEED, other.velocity.y, accel * dir_y * 1.5)
+                )
+                self.velocity.set(
+                    saturated_add(-HOOK_DRAG_SPEED, HOOK_DRAG_SPEED, self.velocity.x, -accel * dir_x * 0.25),
+                    saturated_add(-HOOK_DRAG_SPEED, HOOK_DRAG_SPEED, self.velocity.y, -accel * dir_y * 0.25)
+                )
+                
+        self._clamp_velocity()
+        
+    def _clamp_velocity(self):
         if self.velocity.length() > 6000:
-            self.velocity = self.velocity.normal() * 6000
+            self.velocity.normalize()
+            self.velocity *= 6000
+            
+    def _release_hook(self):
+        self.hooked_player = -1
+        self.hook_state = HookState.RETRACTED
+        self.hookpos.set(self.position.x, self.position.y)
         
-    def move(self, dt, map: MapLoader):
+    def move(self, dt, map: MapLoader, resolver: str = "stepped", players: SpatialHash | None = None):
         rampval = velocity_ramp(self.velocity.length() * 50, VELRAMP_START, VELRAMP_RANGE, VELRAMP_CURVATURE)
         
         self.velocity.x *= rampval
         
-        newpos = self.position * 1
-        oldvel = self.velocity * 1
+        oldvel_x = self.velocity.x
+        oldpos = self._oldpos.set(self.position.x, self.position.y)
         
-        newpos, self.velocity, grounded = self._move_box(newpos, oldvel, map)
+        if resolver == "swept":
+            _, _, grounded = move_box_swept(self.position, self.velocity, map)
+        else:
+            _, _, grounded = self._move_box(self.position, self.velocity, map)
+            
+        if players is not None:
+            self._collide_players(oldpos, players)
         
         if grounded:
             self.jumped &= ~2
@@ -193,108 +330,168 @@ class Tee:
             
         colliding = 0
         if self.velocity.x < 0.001 and self.velocity.x > -0.001:
-            if oldvel.x > 0:
+            if oldvel_x > 0:
                 colliding = 1
-            elif oldvel.x < 0:
+            elif oldvel_x < 0:
                 colliding = -1
         else:
             left_wall = True
             
         self.velocity.x *= 1.0 / rampval
         
-        self.position = newpos
+    def _collide_players(self, oldpos: Vector2, players: SpatialHash):
+        # Walk the move again and stop before the first tee we run into
+        new_x = self.position.x
+        new_y = self.position.y
+        distance = oldpos.distance(self.position)
+        if distance <= 0:
+            return
+        
+        # Samples run up to a unit past the end like DDNet's
+        nearby = [
+            players.tees[i] for i in players.query(oldpos.x, oldpos.y, new_x, new_y, HITBOX_SIZE + 1)
+            if players.tees[i] is not self
+        ]
+        if not nearby:
+            return
+        
+        end = int(distance + 1)
+        last_x = oldpos.x
+        last_y = oldpos.y
+        for i in range(end + 1):
+            a = i / distance
+            x = oldpos.x + (new_x - oldpos.x) * a
+            y = oldpos.y + (new_y - oldpos.y) * a
+            for other in nearby:
+                dx = x - other.position.x
+                dy = y - other.position.y
+                d = math.sqrt(dx * dx + dy * dy)
+                if d < HITBOX_SIZE:
+                    if a > 0:
+                        self.position.set(last_x, last_y)
+                    elif math.sqrt((new_x - other.position.x) ** 2 + (new_y - other.position.y) ** 2) <= d:
+                        # Only moving away from a tee we already overlap is allowed
+                        self.position.set(oldpos.x, oldpos.y)
+                    return
+            last_x = x
+            last_y = y
         
     def post_tick(self, dt, map: MapLoader):
-        tile = map.get_tile(self.position.x, self.position.y, layer="Tele")
+        triggers = map.triggers_at(self.position.x, self.position.y)
+        if triggers:
+            self._trigger(triggers, map)
+            
+    def _trigger(self, triggers: int, map: MapLoader):
+        x, y = self.position.x, self.position.y
+        # Each tile always leads to the same destination or spawn
+        seed = map.cell_index(x, y)
         
-        if isinstance(tile, TeleTile):
-            if tile.is_teleporter():
-                dest = map.get_teleport_destination(tile)
-                if dest is not None:
-                    self.position = dest * 1
-                    if tile.is_red():
-                        self.velocity = Vector2(0, 0)
-                        # self.hooktelebase = self.position * 1
-                        # self.newhook = True
-                        
-                    
+        if triggers & TRIGGER_DEATH:
+            self.die(map.get_spawn(seed))
+            return
         
-    def _move_box(self, _pos: Vector2, _vel: Vector2, map: MapLoader):
-        grounded = False
+        if triggers & TRIGGER_CHECKPOINT:
+            self.tele_checkpoint = map.tele_at(x, y)[1]
+            
+        if triggers & TRIGGER_UNDEEP:
+            self.deep_frozen = False
+        if triggers & TRIGGER_DEEP_FREEZE:
+            self.deep_frozen = True
+            self.freeze_time = FREEZE_TICKS
+        if triggers & TRIGGER_UNFREEZE:
+            self.freeze_time = 0
+        if triggers & TRIGGER_FREEZE:
+            self.freeze_time = FREEZE_TICKS
+            
+        dest = None
+        if triggers & TRIGGER_TELE:
+            dest = map.get_teleport_destination(map.tele_at(x, y)[1], seed)
+        elif triggers & TRIGGER_CP_TELE:
+            # Without a reachable checkpoint it's back to the spawn
+            dest = map.get_checkpoint_destination(self.tele_checkpoint, seed) or map.get_spawn(seed)
+            
+        if dest is not None:
+            self.position.set(dest.x, dest.y)
+            self.teleports += 1
+            if triggers & TRIGGER_TELE_STOP:
+                self.velocity.set(0, 0)
+                # self.hooktelebase = self.position * 1
+                # self.newhook = True
+                
+    def die(self, spawn: Vector2 | None):
+        """
+        Starts over at spawn (in place without one) like a new tee, the
+        inputs are kept.
+        """
+        if spawn is not None:
+            self.position.set(spawn.x, spawn.y)
+            self.teleports += 1
+        self.velocity.set(0, 0)
+        self.jumped = 0
+        self.jump_count = 0
+        self.hooktick = 0
+        self.reset = False
+        self._release_hook()
+        self.freeze_time = 0
+        self.deep_frozen = False
+        self.tele_checkpoint = 0
         
-        pos = _pos * 1
-        vel = _vel * 1
+    def _move_box(self, pos: Vector2, vel: Vector2, map: MapLoader):
+        # Moves pos and vel in place
+        grounded = False
         
         dist = vel.length()
         max = int(dist)
         
         if dist > 0.0001:
             fraction = 1.0 / (max + 1)
+            half = HITBOX_SIZE / 2
             
             for _ in range(max + 1):
-                if vel == Vector2(0, 0):
+                if vel.x == 0 and vel.y == 0:
                     break
                 
-                newpos = pos + vel * fraction
+                newpos_x = pos.x + vel.x * fraction
+                newpos_y = pos.y + vel.y * fraction
                 
-                if newpos == pos:
+                if newpos_x == pos.x and newpos_y == pos.y:
                     break
                 
-                if self._test_box(newpos, map):
+                if map.test_box(newpos_x, newpos_y, half):
                     hits = 0
                     
-                    if self._test_box(Vector2(pos.x, newpos.y), map):
+                    if map.test_box(pos.x, newpos_y, half):
                         # grounded turns true if elasticity > 0
                         
-                        newpos.y = pos.y
+                        newpos_y = pos.y
                         vel.y *= 0
                         hits += 1
                         
-                    if self._test_box(Vector2(newpos.x, pos.y), map):
-                        newpos.x = pos.x
+                    if map.test_box(newpos_x, pos.y, half):
+                        newpos_x = pos.x
                         vel.x *= 0
                         hits += 1
                         
                     if hits == 0:
-                        newpos.y = pos.y
+                        newpos_y = pos.y
                         vel.y *= 0
-                        newpos.x = pos.x
+                        newpos_x = pos.x
                         vel.x *= 0
                 
-                pos = newpos
+                pos.set(newpos_x, newpos_y)
                 
         return pos, vel, grounded
                 
     def _test_box(self, pos: Vector2, map: MapLoader) -> bool:
         # Check 4 corners
-        if self._check_point(pos.x - HITBOX_SIZE / 2, pos.y - HITBOX_SIZE / 2, map):
-            return True
-        if self._check_point(pos.x + HITBOX_SIZE / 2, pos.y - HITBOX_SIZE / 2, map):
-            return True
-        if self._check_point(pos.x - HITBOX_SIZE / 2, pos.y + HITBOX_SIZE / 2, map):
-            return True
-        if self._check_point(pos.x + HITBOX_SIZE / 2, pos.y + HITBOX_SIZE / 2, map):
-            return True
-        return False
+        return map.test_box(pos.x, pos.y, HITBOX_SIZE / 2)
                         
     def _check_point(self, x, y, map: MapLoader) -> bool:
-        return map.get_tile(x, y).is_solid()
+        return map.is_solid(x, y)
         
     def _intersect_line_hook(self, pos0: Vector2, pos1: Vector2, map: MapLoader) -> tuple[int, Vector2]:
-        distance = pos0.distance(pos1)
-        end = int(distance + 1)
-        last = pos0 * 1
-        
-        for i in range(end + 1):
-            t = i / end
-            check_pos = (pos0 * (1 - t)) + (pos1 * t)
-            tile = map.get_tile(check_pos.x, check_pos.y)
-            # print(check_pos, tile)
-            if tile.is_solid():
-                if tile.is_hookable():
-                    return 1, check_pos
-                else:
-                    return 2, last
-            last = check_pos * 1
-            
+        # The returned point is reused by the next call, copy it to keep it
+        hit, x, y = intersect_line_hook(map, pos0.x, pos0.y, pos1.x, pos1.y)
+        if hit:
+            return hit, self._hit.set(x, y)
         return 0, pos1
\ No newline at end of file
@@ -1,30 +1,99 @@
+from collections.abc import Mapping, Sequence
+from typing import Callable, NamedTuple
 import numpy as np
 
 from shared import Vector2
 
+# UV corners of a tile in its 16x16 atlas cell
+UV_CORNERS = np.array(((0, 1), (1, 1), (1, 0), (0, 0)), dtype=np.float64)
+
+# Atlas UVs of every tile id, shared by all tiles of that id
+_all_ids = np.arange(256)
+UV_TABLE = (np.stack((_all_ids % 16, 15 - _all_ids // 16), axis=-1)[:, None, :] + UV_CORNERS) / 16.0
+TILE_UVS = tuple(tuple(tuple(uv) for uv in uvs) for uvs in UV_TABLE.tolist())
+
+class TileArrays(NamedTuple):
+    ids: np.ndarray        # (n,) uint8
+    positions: np.ndarray  # (n, 2) tile coordinates (x, y)
+    flags: np.ndarray      # (n,) uint8, tile flags for Game, tele number for Tele
+
+    @property
+    def uvs(self) -> np.ndarray:
+        # (n, 4, 2) normalized atlas coordinates, from the ids
+        return UV_TABLE[self.ids]
+
+def get_tiles_arrays(tiles: np.ndarray, layer: str) -> TileArrays:
+    if layer == "Game":
+        ids, opts = tiles[:, :, 0], tiles[:, :, 1]
+    elif layer == "Tele":
+        opts, ids = tiles[:, :, 0], tiles[:, :, 1]
+    else:
+        raise ValueError(f"Unknown layer type: {layer}")
+
+    # Row major, same order as walking every (y, x)
+    ys, xs = np.nonzero(ids)
+    _ids = ids[ys, xs]
+
+    return TileArrays(
+        ids=_ids,
+        positions=np.stack((xs, ys), axis=-1),
+        flags=opts[ys, xs]
+    )
+
 def get_tiles_mesh(tiles: np.ndarray, layer: str):
-    height, width, n = tiles.shape
-        
-    for y in range(height):
-        for x in range(width):
-            if layer == "Game":
-                _id, opts = tiles[y, x]
-            elif layer == "Tele":
-                opts, _id = tiles[y, x]
-            else:
-                raise ValueError(f"Unknown layer type: {layer}")
-            
-            if _id == 0:
-                continue         
-            
-            uv_row = 15 - (_id // 16)
-            uv_col = _id % 16
-            
-            uvs = [
-                ((uv_col + dx) / 16.0, (uv_row + dy) / 16.0)
-                for dx, dy in ((0, 1), (1, 1), (1, 0), (0, 0))
-            ]
-            
-            yield _id, Vector2(x, y), uvs, opts
-        
-    # return ids, verts, faces, faces_uv, flags
\ No newline at end of file
+    mesh = get_tiles_arrays(tiles, layer)
+
+    for _id, (x, y), opts in zip(mesh.ids.tolist(), mesh.positions.tolist(), mesh.flags.tolist()):
+        yield _id, Vector2(x, y), TILE_UVS[_id], opts
+
+class TileGrid(Mapping):
+    """
+    Read-only {(x, y): tile} view of the cells whose id, in any of the
+    (ids, table) pairs, is selected by its 256 entry boolean table. Tiles
+    are made by make(x, y) on every lookup and not kept.
+    """
+    def __init__(self, grids: list[tuple[np.ndarray, np.ndarray]], make: Callable):
+        self.grids = grids
+        self.make = make
+
+    def __contains__(self, key) -> bool:
+        x, y = key
+        for ids, table in self.grids:
+            height, width = ids.shape
+            if 0 <= x < width and 0 <= y < height and table[ids[y, x]]:
+                return True
+        return False
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self.make(*key)
+
+    def _mask(self) -> np.ndarray:
+        mask = None
+        for ids, table in self.grids:
+            mask = table[ids] if mask is None else mask | table[ids]
+        return mask
+
+    def __iter__(self):
+        # Row major, like the meshes
+        ys, xs = np.nonzero(self._mask())
+        return zip(xs.tolist(), ys.tolist())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._mask()))
+
+class TileList(Sequence):
+    # Read-only list of the tiles at positions, made on every lookup
+    def __init__(self, positions: np.ndarray, make: Callable):
+        self.positions = positions
+        self.make = make
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        x, y = self.positions[index].tolist()
+        return self.make(x, y)
+
+    def __len__(self) -> int:
+        return len(self.positions)
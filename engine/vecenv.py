@@ -0,0 +1,144 @@
+from typing import Callable
+
+import numpy as np
+
+from engine.constants import *
+from engine.maploader import MapLoader
+from engine.world import TeeWorld
+from shared import HookState
+
+# Map flags given a channel each in the observed tile patches
+PATCH_FLAGS = (TILE_SOLID, TILE_HOOKABLE, TILE_DEATH, TILE_FREEZE)
+
+HOOK_STATES = np.array([state.value for state in HookState])
+
+# direction, target x, target y, jump, hook
+ACTION_DIM = 5
+
+def progress_reward(env: "TeeVecEnv") -> np.ndarray:
+    # Tiles moved to the right this step
+    return (env.world.position[:, 0] - env.previous_x) / UNITS_PER_TILE
+
+class TeeVecEnv:
+    """
+    K independent single tee environments on one map, stepped together.
+    Every environment is a row of one TeeWorld, so a step is a handful of
+    NumPy operations whatever K is.
+
+    Actions are (K, 5) arrays: direction (rounded to -1, 0 or 1), the aim
+    target relative to the tee in units, then jump and hook, pressed above
+    0.5. Observations are (K, obs_dim) float32 rows: position and velocity
+    in tiles, the hook relative to the tee, its state one-hot, the jump
+    flags, then a (2 * radius + 1)^2 tile patch around the tee with one
+    channel per PATCH_FLAGS entry.
+
+    An environment is done after `max_steps` steps or when touching a death
+    tile, and is reset right away: the returned observation is already the
+    one of the new episode, the last one is in info["final_observation"].
+    Reward and final observation of a death are of where the tee died.
+    """
+    def __init__(
+        self,
+        map: MapLoader,
+        count: int,
+        radius: int = 4,
+        max_steps: int = 50 * 60,
+        reward: Callable[["TeeVecEnv"], np.ndarray] = progress_reward,
+        seed: int | None = None
+    ):
+        if not map.spawners:
+            raise ValueError("Map has no spawn tiles")
+
+        self.map = map
+        self.count = count
+        self.radius = radius
+        self.max_steps = max_steps
+        self.reward = reward
+        self.rng = np.random.default_rng(seed)
+
+        # Dead tees are respawned here, after the step saw where they died
+        self.world = TeeWorld(map, count, respawn_dead=False)
+        self.steps = np.zeros(count, dtype=np.int64)
+        self.previous_x = np.zeros(count)
+
+        self._spawns = np.array([(tile.position.x, tile.position.y) for tile in map.spawners], dtype=np.float64) * UNITS_PER_TILE + UNITS_PER_TILE / 2
+
+        # Padded so that any clamped patch center reads empty cells outside the map
+        self._pad = 2 * radius + 1
+        self._grid = np.pad(map.grid, self._pad)
+        offsets = np.arange(-radius, radius + 1)
+        self._dy, self._dx = np.meshgrid(offsets, offsets, indexing="ij")
+        self._channels = np.array(PATCH_FLAGS, dtype=np.uint8)
+
+        self.obs_dim = 6 + len(HOOK_STATES) + 2 + (2 * radius + 1) ** 2 * len(PATCH_FLAGS)
+        self.action_dim = ACTION_DIM
+
+    def reset(self) -> np.ndarray:
+        self._respawn(np.arange(self.count))
+        return self.observe()
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+        world = self.world
+        actions = np.asarray(actions, dtype=np.float64)
+        if actions.shape != (self.count, ACTION_DIM):
+            raise ValueError(f"Expected actions of shape {(self.count, ACTION_DIM)}, got {actions.shape}")
+
+        world.direction[:] = np.clip(np.rint(actions[:, 0]), -1, 1)
+        world.target[:] = actions[:, 1:3]
+        world.should_jump[:] = actions[:, 3] > 0.5
+        world.should_hook[:] = actions[:, 4] > 0.5
+
+        self.previous_x = world.position[:, 0].copy()
+        world.tick(1/50)
+        self.steps += 1
+
+        reward = np.asarray(self.reward(self), dtype=np.float32)
+        done = world.died | (self.steps >= self.max_steps)
+
+        obs = self.observe()
+        info = {}
+        if done.any():
+            index = np.flatnonzero(done)
+            info["final_observation"] = obs[index]
+            info["done_index"] = index
+            self._respawn(index)
+            obs[index] = self.observe(index)
+        return obs, reward, done, info
+
+    def observe(self, index: np.ndarray | None = None) -> np.ndarray:
+        world = self.world
+        if index is None:
+            index = slice(None)
+
+        pos = world.position[index]
+        vel = world.velocity[index]
+        hook = world.hookpos[index] - pos
+        state = world.hook_state[index]
+        jumped = world.jumped[index]
+
+        obs = np.concatenate((
+            pos / UNITS_PER_TILE,
+            vel / UNITS_PER_TILE,
+            hook / UNITS_PER_TILE,
+            state[:, None] == HOOK_STATES[None, :],
+            (jumped[:, None] & (1, 2)) != 0,
+            self._patches(pos).reshape(len(pos), -1),
+        ), axis=1, dtype=np.float32)
+        return obs
+
+    def _patches(self, pos: np.ndarray) -> np.ndarray:
+        height, width = self.map.grid.shape
+        r = self.radius
+        # Far outside the map every center shows only empty cells
+        tx = np.clip(np.floor_divide(pos[:, 0], UNITS_PER_TILE).astype(np.int64), -r - 1, width + r)
+        ty = np.clip(np.floor_divide(pos[:, 1], UNITS_PER_TILE).astype(np.int64), -r - 1, height + r)
+
+        rows = ty[:, None, None] + self._dy + self._pad
+        cols = tx[:, None, None] + self._dx + self._pad
+        cells = self._grid[rows, cols]
+        return (cells[..., None] & self._channels) != 0
+
+    def _respawn(self, index: np.ndarray):
+        spawns = self._spawns[self.rng.integers(len(self._spawns), size=len(index))]
+        self.world.respawn(index, spawns)
+        self.steps[index] = 0
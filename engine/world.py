@@ -0,0 +1,410 @@
+import math
+import numpy as np
+
+from engine.collision import intersect_lines_hook
+from engine.constants import *
+from engine.maploader import MapLoader
+from engine.tee import Tee
+from shared import *
+
+def saturated_add(min, max, current, mod):
+    # Vectorized engine.tee.saturated_add, `mod` never crosses zero per call
+    added = current + mod
+    return np.where(
+        mod < 0,
+        np.where(current < min, current, np.maximum(added, min)),
+        np.where(current > max, current, np.minimum(added, max))
+    )
+
+def velocity_ramp(value: np.ndarray, start: float, range: float, curvature: float) -> np.ndarray:
+    ramp = np.ones_like(value)
+    # Few tees are fast enough to be ramped, math.pow keeps them identical to Tee
+    for i in np.flatnonzero(value >= start).tolist():
+        ramp[i] = 1.0 / math.pow(curvature, (value[i] - start) / range)
+    return ramp
+
+def length(v: np.ndarray) -> np.ndarray:
+    return np.sqrt(v[:, 0] * v[:, 0] + v[:, 1] * v[:, 1])
+
+def normal(v: np.ndarray) -> np.ndarray:
+    l = length(v)
+    out = np.zeros_like(v)
+    moving = l != 0
+    inv = 1.0 / l[moving]
+    out[moving, 0] = v[moving, 0] * inv
+    out[moving, 1] = v[moving, 1] * inv
+    return out
+
+class TeeWorld:
+    """
+    Structure of arrays version of the Tee physics, every tee of the world
+    is advanced at once with NumPy. Row i of each array is the state of
+    tee i, and each tick gives the same result as Tee.tick/move/post_tick.
+    Tees of a world don't interact with each other.
+    """
+    def __init__(self, map: MapLoader, count: int, respawn_dead: bool = True):
+        self.map = map
+        self.count = count
+        # Off, dead tees stay where they died for the caller to respawn
+        self.respawn_dead = respawn_dead
+        self.accumulated_time = 0.0
+
+        self.position = np.zeros((count, 2))
+        self.velocity = np.zeros((count, 2))
+
+        self.jumps = np.full(count, 2, dtype=np.int64)
+        self.jumped = np.zeros(count, dtype=np.int64)
+        self.jump_count = np.zeros(count, dtype=np.int64)
+
+        # Inputs
+        self.direction = np.zeros(count, dtype=np.int64)
+        self.target = np.zeros((count, 2))
+        self.should_jump = np.zeros(count, dtype=bool)
+        self.should_hook = np.zeros(count, dtype=bool)
+
+        self.angle = np.zeros(count, dtype=np.int64)
+        self.target_direction = np.zeros((count, 2))
+
+        self.hookpos = np.zeros((count, 2))
+        self.hookdir = np.zeros((count, 2))
+        self.hooktick = np.zeros(count)
+        self.hook_state = np.full(count, HookState.RETRACTED, dtype=np.int64)
+
+        self.reset = np.zeros(count, dtype=bool)
+
+        self.freeze_time = np.zeros(count, dtype=np.int64)
+        self.deep_frozen = np.zeros(count, dtype=bool)
+        self.tele_checkpoint = np.zeros(count, dtype=np.int64)
+        # Tees that hit a death tile last tick, back at a spawn with respawn_dead
+        self.died = np.zeros(count, dtype=bool)
+
+    @classmethod
+    def from_tees(cls, map: MapLoader, tees: list[Tee]) -> "TeeWorld":
+        world = cls(map, len(tees))
+        world.load_tees(tees)
+        return world
+
+    def load_tees(self, tees: list[Tee]):
+        for i, tee in enumerate(tees):
+            self.position[i] = tuple(tee.position)
+            self.velocity[i] = tuple(tee.velocity)
+            self.jumps[i] = tee.jumps
+            self.jumped[i] = tee.jumped
+            self.jump_count[i] = tee.jump_count
+            self.angle[i] = tee.angle
+            self.target_direction[i] = tuple(tee.target_direction)
+            self.hookpos[i] = tuple(tee.hookpos)
+            self.hookdir[i] = tuple(tee.hookdir)
+            self.hooktick[i] = tee.hooktick
+            self.hook_state[i] = tee.hook_state
+            self.reset[i] = tee.reset
+            self.freeze_time[i] = tee.freeze_time
+            self.deep_frozen[i] = tee.deep_frozen
+            self.tele_checkpoint[i] = tee.tele_checkpoint
+        self.load_inputs(tees)
+
+    def load_inputs(self, tees: list[Tee]):
+        for i, tee in enumerate(tees):
+            self.direction[i] = tee.direction
+            self.target[i] = tuple(tee.target)
+            self.should_jump[i] = tee.should_jump
+            self.should_hook[i] = tee.should_hook
+
+    def store_tees(self, tees: list[Tee]):
+        for i, tee in enumerate(tees):
+            tee.position = Vector2(*self.position[i].tolist())
+            tee.velocity = Vector2(*self.velocity[i].tolist())
+            tee.jumps = int(self.jumps[i])
+            tee.jumped = int(self.jumped[i])
+            tee.jump_count = int(self.jump_count[i])
+            tee.angle = int(self.angle[i])
+            tee.target_direction = Vector2(*self.target_direction[i].tolist())
+            tee.hookpos = Vector2(*self.hookpos[i].tolist())
+            tee.hookdir = Vector2(*self.hookdir[i].tolist())
+            tee.hooktick = float(self.hooktick[i])
+            tee.hook_state = HookState(int(self.hook_state[i]))
+            tee.reset = bool(self.reset[i])
+            tee.freeze_time = int(self.freeze_time[i])
+            tee.deep_frozen = bool(self.deep_frozen[i])
+            tee.tele_checkpoint = int(self.tele_checkpoint[i])
+
+    def respawn(self, index: np.ndarray, positions: np.ndarray):
+        # Tees at index start over like a new Tee at positions
+        self.position[index] = positions
+        self.velocity[index] = 0
+        self.jumps[index] = 2
+        self.jumped[index] = 0
+        self.jump_count[index] = 0
+        self.direction[index] = 0
+        self.target[index] = 0
+        self.should_jump[index] = False
+        self.should_hook[index] = False
+        self.angle[index] = 0
+        self.target_direction[index] = 0
+        self.hookpos[index] = 0
+        self.hookdir[index] = 0
+        self.hooktick[index] = 0
+        self.hook_state[index] = HookState.RETRACTED
+        self.reset[index] = False
+        self.freeze_time[index] = 0
+        self.deep_frozen[index] = False
+        self.tele_checkpoint[index] = 0
+        self.died[index] = False
+
+    def update(self, dt):
+        STEP_TIME = 1/50
+        self.accumulated_time += dt
+        while self.accumulated_time >= STEP_TIME:
+            self.tick(STEP_TIME)
+            self.accumulated_time -= STEP_TIME
+
+    def tick(self, dt):
+        if self.count == 0:
+            return
+        self._tick()
+        self._move()
+        self._post_tick()
+
+    def _tick(self):
+        pos = self.position
+        vel = self.velocity
+
+        # Frozen tees can't walk, jump or hook, their inputs stay as they are
+        self.freeze_time[self.deep_frozen] = FREEZE_TICKS
+        frozen = self.freeze_time > 0
+        self.freeze_time[frozen] -= 1
+        direction = np.where(frozen, 0, self.direction)
+        should_jump = self.should_jump & ~frozen
+        should_hook = self.should_hook & ~frozen
+
+        probe_y = pos[:, 1] + HITBOX_SIZE / 2 + 5
+        grounded = (self.map.flags_at_points(pos[:, 0] + HITBOX_SIZE / 2, probe_y) & TILE_SOLID != 0) | \
+                   (self.map.flags_at_points(pos[:, 0] - HITBOX_SIZE / 2, probe_y) & TILE_SOLID != 0)
+
+        self.target_direction = normal(self.target)
+
+        vel[:, 1] += GRAVITY
+
+        MAXSPEED = np.where(grounded, GROUND_CONTROL_SPEED, AIR_CONTROL_SPEED)
+        ACCELERATION = np.where(grounded, GROUND_CONTROL_ACCEL, AIR_CONTROL_ACCEL)
+        FRICTION = np.where(grounded, GROUND_FRICTION, AIR_FRICTION)
+
+        tmpangle = np.arctan2(self.target[:, 1] / 32, self.target[:, 0] / 32)
+        self.angle = np.where(
+            tmpangle < -(math.pi / 2),
+            tmpangle + (2 * math.pi) * 256,
+            tmpangle * 256
+        ).astype(np.int64)
+
+        # Jumping
+        jumped = self.jumped
+        first_press = should_jump & (jumped & 1 == 0)
+        ground_jump = first_press & grounded & ((jumped & 2 == 0) | (self.jumps != 0))
+        air_jump = first_press & ~ground_jump & (jumped & 2 == 0)
+
+        vel[ground_jump, 1] = -GROUND_JUMP_IMPULSE
+        jumped[ground_jump] |= np.where(self.jumps[ground_jump] > 1, 1, 3)
+        self.jump_count[ground_jump] = 0
+
+        vel[air_jump, 1] = -AIR_JUMP_IMPULSE
+        jumped[air_jump] |= 3
+        self.jump_count[air_jump] += 1
+
+        jumped[~should_jump] &= ~1
+
+        # Hook input
+        fire = should_hook & (self.hook_state == HookState.IDLE)
+        self.hook_state[fire] = HookState.FLYING
+        self.hookpos[fire] = pos[fire] + self.target_direction[fire] * 28 * 1.5
+        self.hookdir[fire] = self.target_direction[fire] * 1
+        self.hooktick[fire] = 50 * (1.25 - HOOK_DURATION)
+
+        release = ~should_hook
+        self.hook_state[release] = HookState.IDLE
+        self.hookpos[release] = pos[release]
+
+        jumped[grounded] &= ~2
+        self.jump_count[grounded] = 0
+
+        # Walking
+        left = direction < 0
+        right = direction > 0
+        still = direction == 0
+        vel[left, 0] = saturated_add(-MAXSPEED[left], MAXSPEED[left], vel[left, 0], -ACCELERATION[left])
+        vel[right, 0] = saturated_add(-MAXSPEED[right], MAXSPEED[right], vel[right, 0], ACCELERATION[right])
+        vel[still, 0] *= FRICTION[still]
+
+        # Hook state machine
+        state = self.hook_state.copy()
+        resting = (state == HookState.IDLE) | (state == HookState.RETRACTED)
+        self.hookpos[resting] = pos[resting]
+        self.hook_state[state == HookState.RETRACT_START] = HookState.RETRACT_MIDDLE
+        self.hook_state[state == HookState.RETRACT_MIDDLE] = HookState.RETRACT_END
+        self.hook_state[state == HookState.RETRACT_END] = HookState.RETRACTED
+
+        flying = np.flatnonzero(state == HookState.FLYING)
+        if flying.size:
+            self._fly_hooks(flying)
+
+        grabbed = self.hook_state == HookState.GRABBED
+        if grabbed.any():
+            self._drag_hooks(np.flatnonzero(grabbed), direction)
+
+        speed = length(vel)
+        fast = speed > 6000
+        if fast.any():
+            vel[fast] = normal(vel[fast]) * 6000
+
+    def _fly_hooks(self, flying: np.ndarray):
+        hookbase = self.position[flying]
+        newpos = self.hookpos[flying] + self.hookdir[flying] * HOOK_FIRE_SPEED
+
+        too_far = length(hookbase - newpos) > HOOK_LENGTH
+        self.hook_state[flying[too_far]] = HookState.RETRACT_START
+        newpos[too_far] = hookbase[too_far] + normal(newpos[too_far] - hookbase[too_far]) * HOOK_LENGTH
+        self.reset[flying[too_far]] = True
+
+        hit, newpos = intersect_lines_hook(self.map, self.hookpos[flying], newpos)
+
+        self.reset[flying[hit != 0]] = True
+
+        still_flying = ~too_far
+        self.hook_state[flying[still_flying & (hit == 1)]] = HookState.GRABBED
+        self.hook_state[flying[still_flying & (hit == 2)]] = HookState.RETRACT_START
+        self.hookpos[flying[still_flying]] = newpos[still_flying]
+
+    def _drag_hooks(self, grabbed: np.ndarray, direction: np.ndarray):
+        pos = self.position[grabbed]
+        vel = self.velocity[grabbed]
+        hookpos = self.hookpos[grabbed]
+
+        far = length(hookpos - pos) > 46
+        hookvel = normal(hookpos - pos) * HOOK_DRAG_ACCEL
+
+        down = hookvel[:, 1] > 0
+        hookvel[down, 1] *= 0.3
+
+        direction = direction[grabbed]
+        along = ((hookvel[:, 0] < 0) & (direction < 0)) | ((hookvel[:, 0] > 0) & (direction > 0))
+        hookvel[:, 0] *= np.where(along, 0.95, 0.75)
+
+        newvel = vel + hookvel
+        newvellen = length(newvel)
+
+        apply = far & ((newvellen < HOOK_DRAG_SPEED) | (newvellen < length(vel)))
+        self.velocity[grabbed[apply]] = newvel[apply]
+
+        self.hooktick[grabbed] += 1
+
+    def _move(self):
+        vel = self.velocity
+
+        rampval = velocity_ramp(length(vel) * 50, VELRAMP_START, VELRAMP_RANGE, VELRAMP_CURVATURE)
+        vel[:, 0] *= rampval
+
+        self.position, self.velocity = self._move_box(self.position, vel)
+
+        self.velocity[:, 0] *= 1.0 / rampval
+
+    def _move_box(self, _pos: np.ndarray, _vel: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        pos = _pos.copy()
+        vel = _vel.copy()
+
+        dist = length(vel)
+        steps = dist.astype(np.int64) + 1
+        fraction = 1.0 / steps
+        steps[~(dist > 0.0001)] = 0
+
+        half = HITBOX_SIZE / 2
+        for step in range(int(steps.max(initial=0))):
+            i = np.flatnonzero(steps > step)
+
+            p = pos[i]
+            v = vel[i]
+            newpos = p + v * fraction[i, None]
+
+            # Same early outs as Tee._move_box, stopped or too slow to move
+            moving = (v != 0).any(axis=1) & (newpos != p).any(axis=1)
+            if not moving.all():
+                steps[i[~moving]] = 0
+                i, p, v, newpos = i[moving], p[moving], v[moving], newpos[moving]
+
+            blocked = self.map.test_boxes(newpos[:, 0], newpos[:, 1], half)
+            if blocked.any():
+                b = np.flatnonzero(blocked)
+                # Both single axis moves tested in one query
+                hits = self.map.test_boxes(
+                    np.concatenate((p[b, 0], newpos[b, 0])),
+                    np.concatenate((newpos[b, 1], p[b, 1])),
+                    half
+                )
+                hit_y, hit_x = hits[:b.size], hits[b.size:]
+                # Corner hits stop on both axes
+                corner = ~hit_y & ~hit_x
+                hit_y |= corner
+                hit_x |= corner
+
+                newpos[b[hit_y], 1] = p[b[hit_y], 1]
+                v[b[hit_y], 1] *= 0
+                newpos[b[hit_x], 0] = p[b[hit_x], 0]
+                v[b[hit_x], 0] *= 0
+
+            pos[i] = newpos
+            vel[i] = v
+
+        return pos, vel
+
+    def _post_tick(self):
+        pos = self.position
+        triggers = self.map.triggers_at_points(pos[:, 0], pos[:, 1])
+        self.died[:] = False
+        if not triggers.any():
+            return
+
+        # Same order as Tee._trigger, dying skips everything else
+        dead = triggers & TRIGGER_DEATH != 0
+        if self.respawn_dead:
+            for i in np.flatnonzero(dead).tolist():
+                x, y = pos[i].tolist()
+                self._die(i, self.map.get_spawn(self.map.cell_index(x, y)))
+        triggers[dead] = 0
+        self.died = dead
+
+        for i in np.flatnonzero(triggers & TRIGGER_CHECKPOINT).tolist():
+            x, y = pos[i].tolist()
+            self.tele_checkpoint[i] = self.map.tele_at(x, y)[1]
+
+        self.deep_frozen[triggers & TRIGGER_UNDEEP != 0] = False
+        deep = triggers & TRIGGER_DEEP_FREEZE != 0
+        self.deep_frozen[deep] = True
+        self.freeze_time[deep] = FREEZE_TICKS
+        self.freeze_time[triggers & TRIGGER_UNFREEZE != 0] = 0
+        self.freeze_time[triggers & TRIGGER_FREEZE != 0] = FREEZE_TICKS
+
+        for i in np.flatnonzero(triggers & (TRIGGER_TELE | TRIGGER_CP_TELE)).tolist():
+            x, y = pos[i].tolist()
+            seed = self.map.cell_index(x, y)
+            if triggers[i] & TRIGGER_TELE:
+                dest = self.map.get_teleport_destination(self.map.tele_at(x, y)[1], seed)
+            else:
+                dest = self.map.get_checkpoint_destination(int(self.tele_checkpoint[i]), seed) or self.map.get_spawn(seed)
+
+            if dest is not None:
+                pos[i] = dest.x, dest.y
+                if triggers[i] & TRIGGER_TELE_STOP:
+                    self.velocity[i] = 0, 0
+
+    def _die(self, i: int, spawn: Vector2 | None):
+        # Same as Tee.die
+        if spawn is not None:
+            self.position[i] = spawn.x, spawn.y
+        self.velocity[i] = 0
+        self.jumped[i] = 0
+        self.jump_count[i] = 0
+        self.hooktick[i] = 0
+        self.reset[i] = False
+        self.hook_state[i] = HookState.RETRACTED
+        self.hookpos[i] = self.position[i]
+        self.freeze_time[i] = 0
+        self.deep_frozen[i] = False
+        self.tele_checkpoint[i] = 0
@@ -1,3 +1,5 @@
+import argparse
+import os
 import random
 import math
 import arcade
@@ -6,6 +8,7 @@ from arcade.gui import UIManager, UILabel, UIAnchorLayout
 
 from engine.constants import *
 from engine.engine import DDNetPhysicsEngine
+from engine.inputlog import InputRecorder
 from engine.maploader import MapLoader
 from engine.tee import Tee
 from gaming.tee import TeeSprite
@@ -19,6 +22,9 @@ SCREEN_TITLE = "TWMap Arcade Renderer"
 
 DEFAULT_ZOOM = 0.65
 
+# Any rate works, tees are drawn between the 50 Hz physics ticks
+FRAME_RATE = 1/60
+
 class GameWindow(arcade.Window):
     def __init__(self):
         super().__init__(
@@ -26,8 +32,8 @@ class GameWindow(arcade.Window):
             SCREEN_HEIGHT,
             SCREEN_TITLE,
             fullscreen=True,
-            draw_rate=1/100,
-            update_rate=1/100
+            draw_rate=FRAME_RATE,
+            update_rate=FRAME_RATE
         )
         arcade.set_background_color(arcade.color.DARK_SLATE_GRAY)
 
@@ -54,7 +60,7 @@ class GameWindow(arcade.Window):
         self.zoom = DEFAULT_ZOOM
 
     def setup(self):
-        self.map = MapLoader("maps/Volleyball_v2.map")
+        self.map = MapLoader(MAP_PATH)
         self.maprender = MapRenderer(
             self.map,
             "assets/ddnet.png"
@@ -65,13 +71,13 @@ class GameWindow(arcade.Window):
         
         self.tees = [self.tee]
 
-        self.tee_sprite = TeeSprite(self.tee)
+        self.physics_engine = DDNetPhysicsEngine(self.map, self.tees)
+        
+        self.tee_sprite = TeeSprite(self.tee, self.physics_engine, 0)
         
         self.tees_sprites = arcade.SpriteList()
         self.tees_sprites.append(self.tee_sprite)
         
-        self.physics_engine = DDNetPhysicsEngine(self.map, self.tees)
-        
         self.ui = UIManager()
         
         self.ui.enable()
@@ -132,7 +138,7 @@ class GameWindow(arcade.Window):
         self.clear()
         self.camera.use()
 
-        self.maprender.draw()
+        self.maprender.draw(self.camera)
         self.tees_sprites.draw()
         
         self.ui.draw()
@@ -146,11 +152,12 @@ class GameWindow(arcade.Window):
             2
         )
         
+        hook_x, hook_y = self.physics_engine.render_hookpos(0)
         arcade.draw_line(
             self.tee_sprite.center_x,
             self.tee_sprite.center_y,
-            self.tee.hookpos.x * 2,
-            -self.tee.hookpos.y * 2,
+            hook_x * 2,
+            -hook_y * 2,
             arcade.color.BLUE,
             2
         )
@@ -198,8 +205,8 @@ class GameWindow(arcade.Window):
 
     def on_key_release(self, key, modifiers):
         if key == arcade.key.R:
-            self.tee.position = random.choice(self.map.spawners).position * 32 + Vector2(16, 16)
-            self.tee.velocity = Vector2(0, 0)
+            # Through the engine, so input logs and interpolation see it
+            self.physics_engine.respawn(0, random.choice(self.map.spawners).position * 32 + Vector2(16, 16))
             
         if key == arcade.key.F: 
             self.zoom = DEFAULT_ZOOM
@@ -222,10 +229,25 @@ class GameWindow(arcade.Window):
     def on_mouse_release(self, x, y, button, modifiers):
         self.pressed_keys.discard(button)
 
+MAP_PATH = "maps/Volleyball_v2.map"
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", help="write the inputs to this input log, replay with engine.batch")
+    args = parser.parse_args()
+    
     window = GameWindow()
     window.setup()
-    arcade.run()
+    
+    if args.record:
+        recorder = InputRecorder.open(args.record, window.physics_engine, os.path.basename(MAP_PATH))
+        window.physics_engine.recorder = recorder
+        try:
+            arcade.run()
+        finally:
+            recorder.close()
+    else:
+        arcade.run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,58 +1,142 @@
+import math
 import arcade
-from pyglet.graphics import Batch
-from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
 
 from engine.maploader import MapLoader
 from engine.constants import TILE_SIZE
 from shared import *
 
-@lru_cache()
-def texture_region_from_uvs(uvs, texture: arcade.Texture):
+# Tiles per side of a chunk, chunks are built and drawn as a whole
+CHUNK_TILES = 32
+
+# Tile flags of Game layer tiles (Teeworlds-compatible)
+TILEFLAG_XFLIP = 1 << 0
+TILEFLAG_YFLIP = 1 << 1
+TILEFLAG_ROTATE = 1 << 3
+TRANSFORM_FLAGS = TILEFLAG_XFLIP | TILEFLAG_YFLIP | TILEFLAG_ROTATE
+
+# Tele numbers are drawn with sprites of these digit glyphs, a 48pt label is GLYPH_SIZE pixels
+TELE_FONT = ":system:fonts/ttf/Liberation/Liberation_Sans_Regular.ttf"
+GLYPH_SIZE = 64
+
+# Shared by every renderer: atlas path -> its 256 tile textures, and
+# (atlas path, tile id, flags) -> transformed tile texture
+_atlas_regions: dict[str, list[arcade.Texture]] = {}
+_tile_textures: dict[tuple[str, int, int], arcade.Texture] = {}
+_digit_glyphs: list[arcade.Texture] = []
+
+def atlas_regions(atlas_path: str) -> list[arcade.Texture]:
+    """
+    The 256 tiles of a 16x16 tile atlas by id, sliced once per atlas.
+    """
+    regions = _atlas_regions.get(atlas_path)
+    if regions is None:
+        image = Image.open(atlas_path).convert("RGBA")
+        size = image.width // 16
+        regions = [
+            arcade.Texture(
+                image.crop((_id % 16 * size, _id // 16 * size, (_id % 16 + 1) * size, (_id // 16 + 1) * size)),
+                hash=f"{atlas_path}:{_id}"
+            )
+            for _id in range(256)
+        ]
+        _atlas_regions[atlas_path] = regions
+    return regions
+
+def tile_texture(atlas_path: str, _id: int, flags: int = 0) -> arcade.Texture:
+    # Flips and rotation only change the texture coordinates, not the image
+    flags &= TRANSFORM_FLAGS
+    key = (atlas_path, _id, flags)
+    texture = _tile_textures.get(key)
+    if texture is None:
+        texture = atlas_regions(atlas_path)[_id]
+        if flags & TILEFLAG_XFLIP:
+            texture = texture.flip_left_right()
+        if flags & TILEFLAG_YFLIP:
+            texture = texture.flip_top_bottom()
+        if flags & TILEFLAG_ROTATE:
+            texture = texture.rotate_90()
+        _tile_textures[key] = texture
+    return texture
+
+def digit_glyphs() -> list[arcade.Texture]:
     """
-    uvs: [(u, v), (u, v), (u, v), (u, v)] in normalized space
-    texture: arcade.Texture
+    White textures of the digits 0-9, drawn once into a glyph strip. Each
+    glyph spans its advance and the font's full line height, so glyphs
+    placed side by side line up like text.
     """
-    us = [u for u, v in uvs]
-    vs = [v for u, v in uvs]
+    if not _digit_glyphs:
+        font = ImageFont.truetype(arcade.resources.resolve(TELE_FONT), GLYPH_SIZE)
+        ascent, descent = font.getmetrics()
+        widths = [math.ceil(font.getlength(str(digit))) for digit in range(10)]
 
-    min_u, max_u = min(us), max(us)
-    min_v, max_v = min(vs), max(vs)
+        strip = Image.new("RGBA", (sum(widths), ascent + descent), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(strip)
+        x = 0
+        for digit, width in enumerate(widths):
+            draw.text((x, 0), str(digit), font=font, fill=(255, 255, 255, 255))
+            _digit_glyphs.append(arcade.Texture(
+                strip.crop((x, 0, x + width, strip.height)),
+                hash=f"tele_digit:{digit}"
+            ))
+            x += width
+    return _digit_glyphs
 
-    x = int(min_u * texture.width)
-    y = int((1.0 - max_v) * texture.height)  # Arcade origin is bottom-left
-    w = int((max_u - min_u) * texture.width)
-    h = int((max_v - min_v) * texture.height)
+class MapChunk:
+    # The tile and tele number sprites of CHUNK_TILES x CHUNK_TILES tiles, one draw call
+    def __init__(self):
+        self.sprites = arcade.SpriteList()
 
-    return arcade.Texture(
-        name=f"region_{x}_{y}_{w}_{h}",
-        image=texture.image.crop((x, y, x + w, y + h))
-    )
+    def draw(self):
+        self.sprites.draw()
 
 class MapRenderer:
-    def __init__(self, map: MapLoader, atlas_path: str):
+    """
+    Draws the Game and Tele layers in chunks of CHUNK_TILES tiles a side.
+    A chunk is only built the first time it is in view, and only chunks
+    in view of the camera are drawn.
+    """
+    def __init__(self, map: MapLoader, atlas_path: str, chunk_tiles: int = CHUNK_TILES):
         self.map = map
-        self.atlas = arcade.load_texture(atlas_path)
-        self.tele_atlas = arcade.load_texture("assets/tele.png")
-
-        self.tiles = arcade.SpriteList(use_spatial_hash=True)
-        
-        self.tele_text = []
-        self.tele_text_batch = Batch()
-        
+        self.atlas_path = atlas_path
+        self.tele_atlas_path = "assets/tele.png"
+        self.chunk_tiles = chunk_tiles
+
+        # (chunk x, chunk y) -> built chunk
+        self.chunks: dict[tuple[int, int], MapChunk] = {}
+        # (chunk x, chunk y) -> [(layer, mesh indices)] of the tiles in it
+        self._chunk_tiles: dict[tuple[int, int], list[tuple[str, np.ndarray]]] = {}
+
         self._build()
-        
+
     def _build(self):
-        for tt in self.tele_text:
-            tt.batch = None
-        self.tele_text.clear()
-        self.tiles.clear()
-        
-        for (x, y), tiles in self.map.tiles.items():
-            for tile in tiles:
-                if tile.is_tele():
-                    region = texture_region_from_uvs(tuple(tile.uvs), self.tele_atlas)
-                else:
-                    region = texture_region_from_uvs(tuple(tile.uvs), self.atlas)
+        # Only sorts the tiles into chunks, no sprite is made yet
+        self.chunks.clear()
+        self._chunk_tiles.clear()
+
+        for layer, mesh in self.map.meshes.items():
+            if not len(mesh.ids):
+                continue
+            keys = mesh.positions // self.chunk_tiles
+            order = np.lexsort((keys[:, 0], keys[:, 1]))
+            keys = keys[order]
+            starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+            for indices, (cx, cy) in zip(np.split(order, starts), keys[np.concatenate(([0], starts))].tolist()):
+                self._chunk_tiles.setdefault((cx, cy), []).append((layer, indices))
+
+    def _build_chunk(self, key: tuple[int, int]) -> MapChunk:
+        chunk = MapChunk()
+        # Drawn over the tiles
+        numbers = []
+
+        for layer, indices in self._chunk_tiles[key]:
+            mesh = self.map.meshes[layer]
+            atlas = self.tele_atlas_path if layer == "Tele" else self.atlas_path
+
+            for _id, (x, y), opts in zip(mesh.ids[indices].tolist(), mesh.positions[indices].tolist(), mesh.flags[indices].tolist()):
+                # Tele tiles carry their number instead of flags
+                region = tile_texture(atlas, _id, 0 if layer == "Tele" else opts)
 
                 sprite = arcade.Sprite(
                     region,
@@ -61,34 +145,62 @@ class MapRenderer:
 
                 sprite.center_x = x * TILE_SIZE + TILE_SIZE / 2
                 sprite.center_y = -y * TILE_SIZE - TILE_SIZE / 2
-                
-                if isinstance(tile, TeleTile) and not (tile.is_checkpoint() and tile.is_teleporter()):
-                    font_size = 48 - (len(str(tile.number)) - 1) * 6
-                    
-                    self.tele_text.append(arcade.Text(
-                        text=str(tile.number),
-                        x=sprite.center_x,
-                        y=sprite.center_y,
-                        z=10,
-                        width=64,
-                        color=arcade.color.WHITE,
-                        font_size=font_size,
-                        anchor_x="center",
-                        anchor_y="center",
-                        batch=self.tele_text_batch
-                    ))
-
-                # # Flags (Teeworlds-compatible)
-                # if tile.flags & (1 << 0):
-                #     sprite.scale_x *= -1
-                # if tile.flags & (1 << 1):
-                #     sprite.scale_y *= -1
-                # if tile.flags & (1 << 3):
-                #     sprite.angle = 270
-
-                self.tiles.append(sprite)    
 
-    def draw(self):
-        self.tiles.draw()
-        
-        self.tele_text_batch.draw()
+                if layer == "Tele" and _id not in (TeleTileType.CP_BLUE_TELE, TeleTileType.CP_RED_TELE):
+                    numbers.extend(self._tele_number(opts, sprite.center_x, sprite.center_y))
+
+                chunk.sprites.append(sprite)
+
+        chunk.sprites.extend(numbers)
+        self.chunks[key] = chunk
+        return chunk
+
+    def _tele_number(self, number: int, center_x: float, center_y: float) -> list[arcade.Sprite]:
+        glyphs = digit_glyphs()
+        text = str(number)
+        # Longer numbers are smaller to fit the tile
+        scale = (48 - (len(text) - 1) * 6) / 48
+
+        x = center_x - sum(glyphs[int(digit)].width for digit in text) * scale / 2
+        sprites = []
+        for digit in text:
+            glyph = glyphs[int(digit)]
+            sprite = arcade.Sprite(glyph, scale=scale)
+            sprite.center_x = x + glyph.width * scale / 2
+            sprite.center_y = center_y
+            sprites.append(sprite)
+            x += glyph.width * scale
+        return sprites
+
+    def visible_chunks(self, camera: arcade.Camera2D | None = None) -> list[tuple[int, int]]:
+        """
+        Keys of the non-empty chunks overlapping the camera's view, all of
+        them without a camera. Tile y grows downwards, world y upwards.
+        """
+        if camera is None:
+            return list(self._chunk_tiles)
+
+        # The camera's sides are relative to its position
+        size = self.chunk_tiles * TILE_SIZE
+        x, y = camera.position
+        x0 = math.floor((x + camera.left) / size)
+        x1 = math.floor((x + camera.right) / size)
+        y0 = math.floor(-(y + camera.top) / size)
+        y1 = math.floor(-(y + camera.bottom) / size)
+
+        # Zoomed far out, walking the chunks that exist is cheaper
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._chunk_tiles):
+            return [(cx, cy) for cx, cy in self._chunk_tiles if x0 <= cx <= x1 and y0 <= cy <= y1]
+        return [
+            (cx, cy)
+            for cy in range(y0, y1 + 1)
+            for cx in range(x0, x1 + 1)
+            if (cx, cy) in self._chunk_tiles
+        ]
+
+    def draw(self, camera: arcade.Camera2D | None = None):
+        for key in self.visible_chunks(camera):
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = self._build_chunk(key)
+            chunk.draw()
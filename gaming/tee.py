@@ -1,18 +1,16 @@
 import arcade
 from math import pow
 
-from engine.constants import TILE_SIZE
+from engine.engine import DDNetPhysicsEngine
 from engine.tee import Tee
 
-# from engine import DDNetPhysicsEngine
-
 def velocity_ramp(value: float, start: float, range: float, curvature: float):
     if value < start:
         return 1.0
     return 1.0 / pow(curvature, (value - start) / range)
 
 class TeeSprite(arcade.Sprite):
-    def __init__(self, tee: Tee):
+    def __init__(self, tee: Tee, engine: DDNetPhysicsEngine | None = None, index: int = 0):
         super().__init__(
             arcade.make_soft_circle_texture(
                 72, arcade.color.ORANGE, 255, 255
@@ -28,7 +26,14 @@ class TeeSprite(arcade.Sprite):
         # self.texture = self.region
         
         self.tee = tee
+        # Drawn between ticks when the engine is given, tee is its player `index`
+        self.engine = engine
+        self.index = index
         
     def update(self, delta_time: float):
-        self.center_x = self.tee.position.x * 2
-        self.center_y = -self.tee.position.y * 2
\ No newline at end of file
+        if self.engine is None:
+            x, y = self.tee.position
+        else:
+            x, y = self.engine.render_position(self.index)
+        self.center_x = x * 2
+        self.center_y = -y * 2
\ No newline at end of file
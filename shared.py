@@ -2,10 +2,20 @@ from enum import IntEnum
 import math
 
 class Vector2:
+    __slots__ = ("x", "y")
+    
     def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
         
+    def set(self, x: float, y: float):
+        self.x = x
+        self.y = y
+        return self
+    
+    def copy(self):
+        return Vector2(self.x, self.y)
+        
     def dot(self, other) -> float:
         return self.x * other.x + self.y * other.y
         
@@ -16,11 +26,21 @@ class Vector2:
         l = 1.0 / length
         return Vector2(self.x * l, self.y * l)
     
+    def normalize(self):
+        # In place normal()
+        length = self.length()
+        if length == 0:
+            return self.set(0, 0)
+        l = 1.0 / length
+        return self.set(self.x * l, self.y * l)
+    
     def length(self) -> float:
         return math.sqrt(self.dot(self))
     
     def distance(self, other) -> float:
-        return (self - other).length()
+        dx = self.x - other.x
+        dy = self.y - other.y
+        return math.sqrt(dx * dx + dy * dy)
         
     def __add__(self, other):
         return Vector2(self.x + other.x, self.y + other.y)
@@ -34,6 +54,27 @@ class Vector2:
     def __truediv__(self, scalar: float):
         return Vector2(self.x / scalar, self.y / scalar)
     
+    # In place versions, they modify and return the same vector
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+    
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+    
+    def __imul__(self, scalar: float):
+        self.x *= scalar
+        self.y *= scalar
+        return self
+    
+    def __eq__(self, other):
+        if not isinstance(other, Vector2):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+    
     def __tuple__(self):
         return (self.x, self.y)
     
@@ -80,7 +121,10 @@ class TeleTileType(IntEnum):
     WEAP_TELE = 14
     HOOK_TELE = 15
 
-class Tile:    
+class Tile:
+    # Tiles are small views made on demand by MapLoader, keep them slotted
+    __slots__ = ("id", "position", "layer")
+    
     def __init__(self, id: int, position: Vector2, layer: str):
         self.id = id
         self.position = position
@@ -103,6 +147,8 @@ class Tile:
 Tile.EMPTY = Tile(0, Vector2(0, 0), "None")
     
 class GameTile(Tile):
+    __slots__ = ("uvs", "flags")
+    
     def __init__(self, id: GameTileType, position: Vector2, uvs: list[tuple[float, float]], flags: int):
         super().__init__(GameTileType(id), position, "Game")
         self.uvs = uvs
@@ -115,6 +161,8 @@ class GameTile(Tile):
         return self.id == GameTileType.HOOKABLE
 
 class TeleTile(Tile):
+    __slots__ = ("uvs", "number")
+    
     def __init__(self, id: TeleTileType, position: Vector2, uvs: list[tuple[float, float]], number: int):
         super().__init__(TeleTileType(id), position, "Tele")
         self.uvs = uvs
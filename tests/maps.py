@@ -0,0 +1,30 @@
+import numpy as np
+import twmap
+
+from shared import GameTileType
+
+def write_map(path: str, game: np.ndarray, tele: np.ndarray | None = None):
+    """
+    Saves a DDNet map made of a Game layer of tile ids, and a Tele layer
+    of (number, id) pairs when given.
+    """
+    m = twmap.Map.empty("DDNet06")
+    group = m.groups.new_physics()
+    layer = group.layers.new_game(game.shape[1], game.shape[0])
+    tiles = layer.tiles
+    tiles[:] = 0
+    tiles[:, :, 0] = game
+    layer.tiles = tiles
+    if tele is not None:
+        layer = group.layers.new_physics("Tele")
+        tiles = layer.tiles
+        tiles[:] = 0
+        tiles[:, :, :2] = tele
+        layer.tiles = tiles
+    m.save(path)
+
+def boxed(width: int, height: int) -> np.ndarray:
+    # Empty room with solid walls all around
+    game = np.zeros((height, width), dtype=np.uint8)
+    game[0, :] = game[-1, :] = game[:, 0] = game[:, -1] = GameTileType.HOOKABLE
+    return game
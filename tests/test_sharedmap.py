@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from engine.sharedmap import SharedMap
+from shared import GameTileType, TeleTileType
+from tests.maps import boxed, write_map
+
+# Grids every worker reads, they must not be private copies
+SHARED_GRIDS = ("grid", "triggers", "game_ids", "game_flags", "tele_ids", "tele_numbers")
+
+class SharedMapTest(unittest.TestCase):
+    def setUp(self):
+        game = boxed(30, 20)
+        game[18, 3] = GameTileType.SPAWN
+        tele = np.zeros((20, 30, 2), dtype=np.uint8)
+        tele[10, 10] = 1, TeleTileType.RED_TELE
+        tele[5, 20] = 1, TeleTileType.TELE_DEST
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "shared.map")
+        write_map(self.path, game, tele)
+
+    def test_grids_are_backed_by_the_shared_block(self):
+        with SharedMap.create(self.path) as owner:
+            worker = SharedMap.attach(owner.spec)
+            try:
+                block = np.frombuffer(worker.shm.buf, dtype=np.uint8)
+                for name in SHARED_GRIDS:
+                    with self.subTest(name):
+                        self.assertTrue(np.shares_memory(getattr(worker.map, name), block))
+                self.assertEqual(worker.map.get_tile(10 * 32, 10 * 32, "Tele").id, TeleTileType.RED_TELE)
+                del block
+            finally:
+                worker.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from engine.constants import UNITS_PER_TILE
+from engine.maploader import MapLoader
+from engine.vecenv import TeeVecEnv
+from shared import GameTileType
+from tests.maps import boxed, write_map
+
+class DeathTest(unittest.TestCase):
+    def setUp(self):
+        # Spawn on the far left, a death tile on the floor far to the right
+        game = boxed(20, 10)
+        game[8, 2] = GameTileType.SPAWN
+        game[8, 15] = GameTileType.DEATH
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "death.map")
+            write_map(path, game)
+            self.map = MapLoader(path, use_cache=False)
+
+    def test_death_step_sees_where_the_tee_died(self):
+        env = TeeVecEnv(self.map, 1, seed=0)
+        env.reset()
+        env.world.position[0] = 15.5 * UNITS_PER_TILE, 6.5 * UNITS_PER_TILE
+
+        actions = np.zeros((1, 5))
+        for _ in range(50):
+            obs, reward, done, info = env.step(actions)
+            if done[0]:
+                break
+        self.assertTrue(done[0])
+
+        # Fell straight down into the death tile, not back to the spawn
+        final = info["final_observation"][0]
+        self.assertEqual(final[0], 15.5)
+        self.assertEqual(int(final[1]), 8)
+        self.assertEqual(reward[0], 0.0)
+        # The next episode starts at the spawn
+        self.assertEqual(obs[0, 0], 2.5)
+
+if __name__ == "__main__":
+    unittest.main()